@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+""" Round trip test of the grid formats
+
+It packs and unpacks generated grids (see `sudoku_io`), in memory and in
+files, and checks that the same grids come back. It also checks the
+canonical forms of the puzzles (see `sudoku_cache`) against random
+symmetries.
+"""
+
+from __future__ import print_function
+import io
+import os.path
+import random
+import shutil
+import tempfile
+
+from sudoku_solver import Sudoku
+from sudoku_generator import generate_corpus, random_transform
+from sudoku_cache import canonical_form, invert_transform
+from sudoku_io import (pack_givens, unpack_givens, pack_candidates,
+                       unpack_candidates, write_packed, read_packed,
+                       PackedGrids)
+
+checks = []
+
+def check(name, passed):
+    checks.append(passed)
+    print('%-56s %s' % (name, 'ok' if passed else 'FAILED'))
+
+# grids of each size : puzzles, with their candidates after the rules
+grids = {3: generate_corpus('hard', 10) + generate_corpus('easy', 10),
+         4: generate_corpus('16x16', 3)}
+candidates = {}
+for n, puzzles in grids.items():
+    candidates[n] = []
+    for puzzle in puzzles:
+        S = Sudoku.from_string(puzzle)
+        S.propagate(max_subset=1)
+        # (copy : the grid is solved below)
+        candidates[n].append(S.masks[:])
+        # solved grids as well
+        S.solve_game(search=True)
+        grids[n] = grids[n] + [S.to_string()]
+
+for n in sorted(grids):
+    size = '%dx%d' % (n*n, n*n)
+    check('givens, %s : unpack(pack(grid)) == grid' % size,
+          all(unpack_givens(pack_givens(grid), n) == grid
+              for grid in grids[n]))
+    check('candidates, %s : some Cells left unsolved' % size,
+          any(bin(m).count('1') > 1
+              for masks in candidates[n] for m in masks))
+    check('candidates, %s : unpack(pack(masks)) == masks' % size,
+          all(unpack_candidates(pack_candidates(masks), n) == masks
+              for masks in candidates[n]))
+    for (kind, items) in (('givens', grids[n]),
+                          ('candidates', candidates[n])):
+        f = io.BytesIO()
+        write_packed(f, items, kind)
+        check('%s, %s : read_packed(write_packed(grids))' % (kind, size),
+              list(read_packed(io.BytesIO(f.getvalue()))) == items)
+        packed = PackedGrids(f.getvalue())
+        check('%s, %s : PackedGrids' % (kind, size),
+              [packed.decode(k) for k in range(len(packed))] == items)
+        packed.close()
+
+# canonical forms, up to the symmetries of the game (9x9 puzzles only :
+# the forms of near-full grids depend on `MAX_TIES`, see `sudoku_cache`)
+rng = random.Random(0)
+puzzles = generate_corpus('hard', 10) + generate_corpus('easy', 10) + \
+          generate_corpus('17-clue', 5)
+forms = [canonical_form(p) for p in puzzles]
+check('canonical_form(random_transform(p)) == canonical_form(p)',
+      all(canonical_form(random_transform(p, rng))[0] == canonical
+          for p, (canonical, t) in zip(puzzles, forms) for k in range(3)))
+check('invert_transform(canonical, t) == p',
+      all(invert_transform(canonical, t) == p
+          for p, (canonical, t) in zip(puzzles, forms)))
+
+# files, compressed or mapped in memory
+directory = tempfile.mkdtemp()
+try:
+    path = os.path.join(directory, 'grids.sdk')
+    write_packed(path, grids[3])
+    packed = PackedGrids.open(path)
+    check('givens file : PackedGrids.open',
+          [packed.decode(k) for k in range(len(packed))] == grids[3])
+    packed.close()
+    write_packed(path + '.gz', grids[3])
+    check('givens file : read_packed(.sdk.gz)',
+          list(read_packed(path + '.gz')) == grids[3])
+finally:
+    shutil.rmtree(directory)
+
+print('\nTest ran without failure')
+print('Number of successes : %d/%d' % (sum(checks), len(checks)))
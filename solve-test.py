@@ -17,12 +17,9 @@ sudoku_games.sort()
 successes = 0
 for game in sudoku_games:
     S = Sudoku(game)
-    (is_solved, nb_iter) = S.solve_game()
-    if all([len(c.possibilities)==9 for c in S.cells]):
-        print(' (this was an empty Sudoku)')
-        successes += 1 # count it as a success anyway
-    else:
-        successes += int(is_solved)
+    # rules first, then depth-first search for the grids they cannot finish
+    (is_solved, nb_iter) = S.solve_game(search=True)
+    successes += int(is_solved)
     print('-'*50)
 
 print('\nTest ran without failure')
@@ -0,0 +1,107 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+""" Test of the grid state handling
+
+It saves and rolls back the grid state of an empty game, with snapshots
+and nested checkpoints (see `Sudoku.snapshot` and `Sudoku.checkpoint`),
+and checks that the grid comes back to the expected states.
+It also counts the solutions of a few games with each backend (see
+`Sudoku.count_solutions`), which must leave their grid unchanged.
+"""
+
+from __future__ import print_function
+
+from sudoku_solver import Sudoku
+
+checks = []
+
+def check(name, passed):
+    checks.append(passed)
+    print('%-56s %s' % (name, 'ok' if passed else 'FAILED'))
+
+def raises(function, *args):
+    """does `function(*args)` raise ValueError ?"""
+    try:
+        function(*args)
+    except ValueError:
+        return True
+    return False
+
+def guess(S, i):
+    """solve Cell `i` with its lowest possibility (lowest bit of the
+    mask), and propagate"""
+    S.cells[i].keep_mask(S.masks[i] & -S.masks[i])
+    S.propagate()
+
+# (guesses on an empty grid cannot meet a contradiction)
+S = Sudoku.from_string('.'*81)
+root = S.snapshot()
+
+# nested checkpoints
+outer = S.checkpoint()
+guess(S, 0)
+first = S.snapshot()
+inner = S.checkpoint()
+guess(S, 80)
+check('checkpoints : numbered from the outermost one',
+      (outer, inner) == (1, 2))
+S.undo()
+check('undo() : back to the last checkpoint', S.snapshot() == first)
+inner = S.checkpoint()
+guess(S, 80)
+second = S.snapshot()
+S.commit(inner)
+check('commit(inner) : changes kept', S.snapshot() == second)
+check('guesses : three distinct grid states',
+      len(set([root, first, second])) == 3)
+S.undo(outer)
+check('undo(outer) : changes committed to inner rolled back',
+      S.snapshot() == root)
+check('undo(outer) : no checkpoint left', raises(S.undo))
+
+S.checkpoint()
+guess(S, 0)
+S.checkpoint()
+guess(S, 80)
+S.undo(1)
+check('undo(outer) : inner checkpoints removed as well',
+      S.snapshot() == root and raises(S.undo))
+
+# snapshots
+S.checkpoint()
+guess(S, 0)
+S.checkpoint()
+S.restore(root)
+check('restore(token) : back to the snapshot', S.snapshot() == root)
+check('restore(token) : checkpoints discarded', raises(S.undo))
+check('restore(token) : next checkpoint is the outermost one',
+      S.checkpoint() == 1)
+S.restore(root)
+check('restore(token) : snapshot of another size rejected',
+      raises(S.restore, root[:-1]))
+
+# solution counts : contradictory, unique and empty grids
+games = [('contradictory', Sudoku.from_string('11' + '.'*79), 0),
+         ('unique', Sudoku('./sudoku-examples/sudoku-diabolic4.txt',
+                           verbose=False), 1),
+         ('empty', Sudoku.from_string('.'*81), 2)]
+for (name, S, expected) in games:
+    for (backend, workers) in (('rules', None), ('dlx', None),
+                               ('rules', 2)):
+        label = backend if workers is None else '%s x%d' % (backend,
+                                                              workers)
+        token = S.snapshot()
+        S.checkpoint()
+        counts = [S.count_solutions(limit, backend, workers)
+                  for limit in (2, 1, 0)]
+        check('%s grid, %s : %d solutions' % (name, label, expected),
+              counts == [expected, min(expected, 1), 0])
+        check('%s grid, %s : grid unchanged' % (name, label),
+              S.snapshot() == token)
+        S.undo()
+        check('%s grid, %s : checkpoint kept' % (name, label),
+              S.snapshot() == token and raises(S.undo))
+    check('%s grid : is_unique' % name, S.is_unique() == (expected == 1))
+
+print('\nTest ran without failure')
+print('Number of successes : %d/%d' % (sum(checks), len(checks)))
@@ -0,0 +1,214 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""
+Batch solving
+=============
+
+Solve large collections of Sudoku grids with a pool of worker processes.
+
+Grids travel to and from the workers as compact 81 characters strings
+(row-major order, "." for empty cells), by chunks of `chunksize` grids.
+The number of chunks in flight is bounded, so that arbitrarily long
+inputs are consumed lazily.
+
+Command line usage (grids read with `sudoku_io.read_grids`, or with
+`sudoku_io.read_packed` for the packed givens files ending with ".sdk"
+or ".sdk.gz", solutions written one per line)::
+
+    $ python sudoku_batch.py --workers 4 puzzles.txt > solutions.txt
+    $ python sudoku_batch.py --workers 4 puzzles.sdk > solutions.txt
+"""
+
+from __future__ import division, print_function
+import queue
+from collections import deque
+
+from sudoku_solver import Sudoku
+
+
+def compact_grid(grid):
+    """81 characters string form of `grid`, which can be either a Sudoku
+    instance or a string of 81 symbols (any symbol which is not a digit
+    from 1 to 9 is an empty cell, blanks around are ignored)
+    """
+    if isinstance(grid, Sudoku):
+        return grid.to_string()
+    grid = grid.strip()
+    if len(grid) != 81:
+        raise ValueError('Grid "%s" is of wrong size (should contain 81 '
+                         'symbols instead of %d)' % (grid, len(grid)))
+    return ''.join(ch if ch in '123456789' else '.' for ch in grid)
+
+
+def solve_string(grid, search=True, backend='rules'):
+    """solve one grid given as a compact string (see `compact_grid`)
+
+    Returns the solution as an 81 characters string,
+    or None if the grid could not be solved (a contradictory grid raises
+    `sudoku_solver.Contradiction` if `search` is False, see
+    `Sudoku.solve_game`)
+    """
+    S = Sudoku.from_string(grid)
+    (is_solved, nb_iter) = S.solve_game(search=search, backend=backend)
+    return S.to_string() if is_solved else None
+
+
+def _solve_chunk(start, chunk, options):
+    """worker task : solve a chunk of compact grids
+    Returns (start, list of solutions)"""
+    return (start, [solve_string(grid, **options) for grid in chunk])
+
+
+def _chunks(grids, chunksize):
+    """split the iterable `grids` into (start index, list of compact grids)"""
+    chunk = []
+    start = 0
+    for grid in grids:
+        chunk.append(compact_grid(grid))
+        if len(chunk) == chunksize:
+            yield (start, chunk)
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield (start, chunk)
+
+
+def pool_map(function, tasks, workers, window=None):
+    """generator of the results of `function(*args)` for each tuple `args`
+    of the iterable `tasks`, in order, computed by a pool of `workers`
+    processes (`function` must be defined at module level)
+
+    At most `window` tasks (default : 2*workers) are in flight, so that
+    arbitrarily long iterables are consumed lazily. The pool is stopped
+    as well when the consumer stops early.
+    """
+    import multiprocessing
+    if window is None:
+        window = 2*workers
+    pool = multiprocessing.Pool(workers)
+    try:
+        pending = deque()
+        for args in tasks:
+            pending.append(pool.apply_async(function, args))
+            if len(pending) >= window:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+        pool.close()
+    finally:
+        # also reached when the consumer stops early
+        pool.terminate()
+        pool.join()
+
+
+def solve_many(grids, workers=None, chunksize=64, ordered=True,
+               search=True, backend='rules'):
+    """solve an iterable of grids (Sudoku instances or strings,
+    see `compact_grid`) with a pool of `workers` processes
+    (default : number of CPUs, 1 means solving in the current process)
+
+    search, backend : solving options (see `Sudoku.solve_game`)
+
+    Generator of (index, solution) pairs, where `index` is the position
+    of the grid in `grids` and `solution` is an 81 characters string
+    (None if the grid could not be solved).
+    The pairs come in input order if `ordered` is True,
+    otherwise as soon as their chunk is completed.
+    """
+    options = {'search': search, 'backend': backend}
+    chunks = _chunks(grids, chunksize)
+    if workers is None or workers > 1:
+        # (imported on demand : slow to import, and not needed by the
+        # short single process runs)
+        import multiprocessing
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers <= 1:
+        for (start, chunk) in chunks:
+            for k, grid in enumerate(chunk):
+                yield (start + k, solve_string(grid, **options))
+        return
+    if ordered:
+        tasks = ((start, chunk, options) for (start, chunk) in chunks)
+        for (start, solutions) in pool_map(_solve_chunk, tasks, workers):
+            for k, solution in enumerate(solutions):
+                yield (start + k, solution)
+        return
+
+    # bounded number of chunks in flight (see `pool_map`)
+    window = 2*workers
+    pool = multiprocessing.Pool(workers)
+    try:
+        done = queue.Queue()
+        nb_pending = 0
+        chunks_left = True
+        while chunks_left or nb_pending > 0:
+            # fill the window
+            while chunks_left and nb_pending < window:
+                try:
+                    (start, chunk) = next(chunks)
+                except StopIteration:
+                    chunks_left = False
+                    break
+                pool.apply_async(_solve_chunk, (start, chunk, options),
+                                 callback=done.put,
+                                 error_callback=done.put)
+                nb_pending += 1
+            if nb_pending == 0:
+                break
+            result = done.get()
+            nb_pending -= 1
+            if isinstance(result, Exception):
+                raise result
+            (start, solutions) = result
+            for k, solution in enumerate(solutions):
+                yield (start + k, solution)
+        pool.close()
+    finally:
+        # also reached when the consumer stops early
+        pool.terminate()
+        pool.join()
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    from sudoku_io import (read_grids, read_packed, packed_kind, write_grids,
+                           PACKED_SUFFIX)
+
+    parser = argparse.ArgumentParser(
+        description='Solve Sudoku grids given one per line (81 symbols)'
+                    ' or laid out on several lines, or packed givens'
+                    ' (files ending with "%s")' % PACKED_SUFFIX)
+    parser.add_argument('input', nargs='?', default='-',
+                        help='input file ("-" for standard input)')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='number of worker processes (default: CPUs)')
+    parser.add_argument('-c', '--chunksize', type=int, default=64,
+                        help='number of grids sent to a worker at once')
+    parser.add_argument('-u', '--unordered', action='store_true',
+                        help='write the solutions as they complete, '
+                             'prefixed by the grid number')
+    parser.add_argument('--backend', default='rules', choices=['rules', 'dlx'])
+    args = parser.parse_args()
+
+    if args.input.endswith((PACKED_SUFFIX, PACKED_SUFFIX + '.gz')):
+        # (only the givens of 9x9 grids can be solved in batch)
+        try:
+            (kind, n) = packed_kind(args.input)
+        except (IOError, ValueError) as e:
+            parser.error(str(e))
+        if (kind, n) != ('givens', 3):
+            parser.error('%s holds %s of %dx%d grids, not givens of 9x9 '
+                         'grids' % (args.input, kind, n*n, n*n))
+        grids = read_packed(args.input)
+    else:
+        grids = read_grids(sys.stdin if args.input == '-' else args.input)
+    results = solve_many(grids, workers=args.workers,
+                         chunksize=args.chunksize,
+                         ordered=not args.unordered, backend=args.backend)
+    if args.unordered:
+        for (index, solution) in results:
+            print('%d %s' % (index, solution or '-'))
+    else:
+        write_grids(sys.stdout, (solution for (index, solution) in results))
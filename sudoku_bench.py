@@ -0,0 +1,291 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""
+Solver benchmark
+================
+
+Repeatable speed measurement of the Sudoku solver over graded corpora :
+ * 'examples' : the grids of the `sudoku-examples/` directory
+ * 'easy', 'hard', '17-clue', 'adversarial' : seeded generated puzzles
+   (see `sudoku_generator`), so that the benchmark runs fully offline
+ * '16x16', '25x25' : seeded generated puzzles on larger grids, to show
+   how the solver scales with the grid size
+
+For each corpus, it reports the throughput (puzzles/s), the p50/p99
+solving latency, the mean number of iterations and search nodes and the
+peak memory allocated while solving. Results can be saved as JSON and
+compared with a previous run to spot regressions::
+
+    $ python sudoku_bench.py --output baseline.json
+    $ python sudoku_bench.py --compare baseline.json
+
+The cold start of the modules spawned per job is checked separately
+against a time budget (see `IMPORT_BUDGETS`)::
+
+    $ python sudoku_bench.py --import-time
+"""
+
+from __future__ import division, print_function
+import json
+import math
+import os.path
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from glob import glob
+
+from sudoku_solver import Sudoku, RULES
+from sudoku_io import read_grids
+import sudoku_generator
+
+# Solver configurations (keyword arguments of `Sudoku.solve_game`)
+SOLVERS = {
+    'rules': {'search': True},
+    'incremental': {'search': True, 'incremental': True},
+    'dlx': {'backend': 'dlx'},
+    # without / with all the inference rules across the Cell sets
+    'sets-only': {'search': True, 'rules': ()},
+    'all-rules': {'search': True, 'rules': RULES},
+    # search of each puzzle shared by worker processes (see `sudoku_parallel`)
+    'parallel': {'search': True, 'workers': 4},
+}
+
+CORPORA = ('examples',) + sudoku_generator.KINDS
+
+# metrics compared between runs, with True if higher is better
+COMPARED_METRICS = {'puzzles_per_sec': True, 'p50_ms': False, 'p99_ms': False}
+
+# cold import time budgets (ms) of the modules run as short-lived
+# processes, measured by `measure_imports`
+IMPORT_BUDGETS = {'sudoku_solver': 12., 'sudoku_batch': 20.}
+
+# modules which must only be imported when they are used
+LAZY_IMPORTS = ('logging', 'multiprocessing', 'shelve', 'termcolor',
+                'sudoku_display', 'sudoku_dlx', 'sudoku_cache',
+                'sudoku_parallel')
+
+
+def load_corpus(name, count=20, seed=0):
+    """list of the compact puzzles of the corpus `name` (see `CORPORA`)"""
+    if name == 'examples':
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'sudoku-examples')
+        return [grid for path in sorted(glob(os.path.join(directory, '*.txt')))
+                for grid in read_grids(path)]
+    return sudoku_generator.generate_corpus(name, count, seed)
+
+
+def percentile(sorted_values, q):
+    """nearest-rank percentile `q` (0-100) of a sorted list"""
+    if not sorted_values:
+        return float('nan')
+    rank = max(1, int(math.ceil(q/100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def solve_one(puzzle, options):
+    """solve one puzzle, returns (is_solved, nb_iter, nodes, seconds)"""
+    S = Sudoku.from_string(puzzle)
+    start = time.perf_counter()
+    (is_solved, nb_iter) = S.solve_game(**options)
+    elapsed = time.perf_counter() - start
+    nodes = S.search_stats['nodes'] if S.search_stats else 0
+    return (is_solved, nb_iter, nodes, elapsed)
+
+
+def run_corpus(puzzles, options, memory=True):
+    """benchmark the solver on a list of puzzles, returns a dict of metrics"""
+    latencies = []
+    iterations = []
+    nodes = []
+    solved = 0
+    start = time.perf_counter()
+    for puzzle in puzzles:
+        (is_solved, nb_iter, nb_nodes, elapsed) = solve_one(puzzle, options)
+        solved += int(is_solved)
+        latencies.append(elapsed)
+        iterations.append(nb_iter)
+        nodes.append(nb_nodes)
+    total = time.perf_counter() - start
+    latencies.sort()
+    n = max(len(puzzles), 1)
+    result = {
+        'count': len(puzzles),
+        'solved': solved,
+        'puzzles_per_sec': len(puzzles) / total if total > 0 else 0.,
+        'p50_ms': percentile(latencies, 50) * 1e3,
+        'p99_ms': percentile(latencies, 99) * 1e3,
+        'max_ms': latencies[-1] * 1e3 if latencies else 0.,
+        'mean_iterations': sum(iterations) / n,
+        'mean_nodes': sum(nodes) / n,
+    }
+    if memory:
+        # separate pass, since tracing allocations slows the solver down
+        tracemalloc.start()
+        peak = 0
+        for puzzle in puzzles:
+            tracemalloc.reset_peak()
+            solve_one(puzzle, options)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        result['peak_memory_kb'] = peak / 1024
+    return result
+
+
+def run_benchmark(solver='rules', corpora=CORPORA, count=20, seed=0,
+                  memory=True):
+    """benchmark the `solver` configuration (see `SOLVERS`) on `corpora`
+
+    Returns a JSON-serializable dict with the run parameters ('meta')
+    and the metrics of each corpus ('corpora')
+    """
+    options = SOLVERS[solver]
+    results = {
+        'meta': {'solver': solver, 'options': options, 'count': count,
+                 'seed': seed, 'python': platform.python_version(),
+                 'platform': platform.platform(),
+                 'date': time.strftime('%Y-%m-%d %H:%M:%S')},
+        'corpora': {},
+    }
+    for name in corpora:
+        puzzles = load_corpus(name, count, seed)
+        results['corpora'][name] = run_corpus(puzzles, options, memory)
+    return results
+
+
+def measure_imports(modules=IMPORT_BUDGETS, repeat=5):
+    """cold import of each of the `modules` in a fresh interpreter
+    (`python -X importtime`), keeping the best of `repeat` runs.
+    A first run writes the bytecode caches, like for an installed package.
+
+    Returns a dict module -> dict with
+     * 'import_ms' : cumulative import time of the module
+     * 'output' : text printed by the import (should be empty)
+     * 'loaded' : modules of `LAZY_IMPORTS` loaded by the import
+    """
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for module in modules:
+        # the names of the loaded modules follow the output of the import
+        code = ('import %s, sys; '
+                'sys.stdout.write("\\0" + " ".join(sys.modules))' % module)
+        best = None
+        for k in range(repeat + 1):
+            process = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', code],
+                cwd=directory, env=env, capture_output=True,
+                universal_newlines=True, check=True)
+            # last line : "import time: self [us] | cumulative | module"
+            cumulative = int(process.stderr.splitlines()[-1].split('|')[1])
+            if k > 0 and (best is None or cumulative < best):
+                best = cumulative
+        (output, _, loaded) = process.stdout.rpartition('\0')
+        results[module] = {'import_ms': best / 1e3, 'output': output,
+                           'loaded': sorted(set(loaded.split()) &
+                                            set(LAZY_IMPORTS))}
+    return results
+
+
+def check_imports(results, budgets=IMPORT_BUDGETS):
+    """print the import measurements (see `measure_imports`) against
+    their `budgets`. Returns the list of the modules which failed, by
+    exceeding their budget, printing something or loading lazy imports"""
+    failures = []
+    print('%-16s %11s %11s' % ('module', 'import (ms)', 'budget (ms)'))
+    for module, r in sorted(results.items()):
+        problems = []
+        if r['import_ms'] > budgets[module]:
+            problems.append('over budget')
+        if r['output']:
+            problems.append('prints %r' % r['output'][:40])
+        if r['loaded']:
+            problems.append('loads %s' % ', '.join(r['loaded']))
+        if problems:
+            failures.append(module)
+        print('%-16s %11.2f %11.2f  %s' % (module, r['import_ms'],
+                                            budgets[module],
+                                            '; '.join(problems) or 'ok'))
+    return failures
+
+
+def print_results(results):
+    """print the metrics of each corpus as a table"""
+    print('Solver "%(solver)s", seed %(seed)d' % results['meta'])
+    header = ('%-12s %6s %6s %10s %9s %9s %8s %8s %10s' %
+              ('corpus', 'count', 'solved', 'puzzles/s', 'p50 (ms)',
+               'p99 (ms)', 'iter', 'nodes', 'mem (kB)'))
+    print(header)
+    print('-'*len(header))
+    for name, r in results['corpora'].items():
+        print('%-12s %6d %6d %10.1f %9.2f %9.2f %8.1f %8.1f %10s' %
+              (name, r['count'], r['solved'], r['puzzles_per_sec'],
+               r['p50_ms'], r['p99_ms'], r['mean_iterations'],
+               r['mean_nodes'],
+               '%.1f' % r['peak_memory_kb'] if 'peak_memory_kb' in r else '-'))
+
+
+def compare_results(baseline, results, tolerance=0.1):
+    """print the relative change of the compared metrics with respect to
+    `baseline`. Returns the list of (corpus, metric) pairs which got worse
+    by more than `tolerance` (relative)"""
+    regressions = []
+    print('\nComparison with the baseline (%s):' %
+          baseline['meta'].get('date', '?'))
+    for name, r in results['corpora'].items():
+        if name not in baseline['corpora']:
+            continue
+        for metric, higher_is_better in sorted(COMPARED_METRICS.items()):
+            old = baseline['corpora'][name][metric]
+            new = r[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = ''
+            if worse > tolerance:
+                regressions.append((name, metric))
+                flag = '  <-- regression'
+            print('  %-12s %-16s %10.2f -> %10.2f (%+.0f%%)%s' %
+                  (name, metric, old, new, 100*change, flag))
+    return regressions
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Sudoku solver benchmark')
+    parser.add_argument('--solver', default='rules', choices=sorted(SOLVERS))
+    parser.add_argument('--corpus', action='append', choices=CORPORA,
+                        help='corpus to run (repeatable, default: all)')
+    parser.add_argument('-n', '--count', type=int, default=20,
+                        help='number of generated puzzles per corpus')
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the memory measurement pass')
+    parser.add_argument('-o', '--output', help='save the results as JSON')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='compare with the JSON results of a previous run')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='relative change counted as a regression')
+    parser.add_argument('--import-time', action='store_true',
+                        help='only check the cold import time budgets')
+    args = parser.parse_args()
+
+    if args.import_time:
+        sys.exit(1 if check_imports(measure_imports()) else 0)
+
+    results = run_benchmark(args.solver, args.corpus or CORPORA, args.count,
+                            args.seed, memory=not args.no_memory)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare_results(baseline, results, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,279 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""
+Solution cache
+==============
+
+Cache of Sudoku solutions keyed by the canonical form of the puzzles,
+so that a puzzle equivalent to an already solved one (up to the
+symmetries of the game) is answered without solving it again.
+
+The symmetries are the relabeling of the numbers, the permutations of the
+rows (columns) within a band (stack), the permutations of the bands
+(stacks) and the transposition. The canonical form of a puzzle is the
+smallest equivalent puzzle for the following order :
+ 1. the pattern of the clues, read stack by stack (each stack being read
+    row by row), 0 for an empty cell and 1 for a clue
+ 2. for equal patterns, the puzzle string (row-major order), the numbers
+    being relabeled in order of first appearance
+
+The pattern is minimized one stack at a time, which only keeps the few
+candidate transforms which can still give the smallest pattern. For
+patterns with many symmetries (near-empty or near-full grids, like the
+solutions), only the first `MAX_TIES` equivalent transforms are compared
+in step 2, so that two equivalent puzzles may then get different forms
+(a cache miss, but never a wrong answer).
+
+Puzzles and solutions are compact 81 characters strings
+("." for empty cells, see `Sudoku.to_string`). Larger grids (16x16...)
+are only cached verbatim, without canonical form.
+"""
+
+from __future__ import division, print_function
+from collections import OrderedDict
+from itertools import permutations, product
+
+# permutations of the 3 rows (columns) of a band (stack)
+_PERMS = tuple(permutations(range(3)))
+
+# number of pattern-preserving transforms compared in step 2
+MAX_TIES = 512
+
+
+def _transpose(grid):
+    return ''.join(grid[a1*9 + a0] for a0 in range(9) for a1 in range(9))
+
+
+def _band_key(rows):
+    """sort key of a band, given the value tuples of its sorted rows :
+    the values of the first stack of the 3 rows, then of the second..."""
+    return tuple(zip(*rows))
+
+
+def _arrange_rows(row_values):
+    """smallest arrangement of the rows for the pattern order.
+    `row_values[a0]` is the tuple of the pattern values of row a0
+    in each stack chosen so far.
+
+    Returns (key, bands) with `bands` the list of the 3 bands in order,
+    each being the list of its (row values, row number) in order
+    """
+    bands = [sorted((row_values[a0], a0) for a0 in range(3*b, 3*b+3))
+             for b in range(3)]
+    bands.sort(key=lambda band: _band_key([values for values, a0 in band]))
+    key = tuple(zip(*[values for band in bands for values, a0 in band]))
+    return (key, bands)
+
+
+def _orders(items, key):
+    """all the orders of the sorted list `items` which keep it sorted
+    for `key`, by permuting the runs of items with identical keys"""
+    runs = []
+    for item in items:
+        if runs and key(runs[-1][0]) == key(item):
+            runs[-1].append(item)
+        else:
+            runs.append([item])
+    for run_orders in product(*[permutations(run) for run in runs]):
+        yield [item for run in run_orders for item in run]
+
+
+def _row_orders(bands):
+    """all the row orders giving the same (smallest) pattern,
+    by permuting identical rows within a band and identical bands"""
+    band_key = lambda band: _band_key([values for values, a0 in band])
+    for band_order in _orders(bands, band_key):
+        row_choices = [list(_orders(band, lambda row: row[0]))
+                       for band in band_order]
+        for band_rows in product(*row_choices):
+            yield [a0 for rows in band_rows for (values, a0) in rows]
+
+
+def _min_pattern(grid):
+    """smallest clue pattern of `grid` (not transposed)
+
+    Returns (key, leaves) with `leaves` the list of
+    (column order, bands) reaching the smallest pattern `key`
+    """
+    filled = [[grid[a0*9 + a1] != '.' for a1 in range(9)] for a0 in range(9)]
+    # values[a0][s][p] : pattern of row a0 in stack s with permutation p
+    values = [[[filled[a0][3*s + p[0]]*4 + filled[a0][3*s + p[1]]*2 +
+                filled[a0][3*s + p[2]] for p in _PERMS]
+               for s in range(3)] for a0 in range(9)]
+    partial = [((), [()]*9)]
+    for level in range(3):
+        candidates = []
+        for (col_order, row_values) in partial:
+            for s in range(3):
+                if 3*s in [c - c % 3 for c in col_order]:
+                    continue
+                for k, p in enumerate(_PERMS):
+                    new_values = [row_values[a0] + (values[a0][s][k],)
+                                  for a0 in range(9)]
+                    (key, bands) = _arrange_rows(new_values)
+                    candidates.append((key, col_order +
+                                       tuple(3*s + j for j in p),
+                                       new_values, bands))
+        best = min(c[0] for c in candidates)
+        candidates = [c for c in candidates if c[0] == best]
+        partial = [(col_order, row_values)
+                   for (key, col_order, row_values, bands) in candidates]
+    return (best, [(col_order, bands)
+                   for (key, col_order, row_values, bands) in candidates])
+
+
+def canonical_form(grid):
+    """canonical form of the compact puzzle `grid`
+
+    Returns (canonical, transform) where `transform` maps `grid` to
+    `canonical` (see `apply_transform` and `invert_transform`)
+    """
+    if len(grid) != 81:
+        raise ValueError('Canonical forms are only defined for 9x9 grids')
+    leaves = []
+    best_pattern = None
+    for transpose in (False, True):
+        g = _transpose(grid) if transpose else grid
+        (key, pattern_leaves) = _min_pattern(g)
+        if best_pattern is None or key < best_pattern:
+            best_pattern = key
+            leaves = []
+        if key == best_pattern:
+            leaves.extend((transpose, col_order, bands)
+                          for (col_order, bands) in pattern_leaves)
+    best = None
+    nb_ties = 0
+    for (transpose, col_order, bands) in leaves:
+        for row_order in _row_orders(bands):
+            transform = (transpose, tuple(row_order), col_order, None)
+            (candidate, relabel) = _relabel(apply_transform(grid, transform))
+            if best is None or candidate < best[0]:
+                best = (candidate, transform[:3] + (relabel,))
+            nb_ties += 1
+            if nb_ties >= MAX_TIES:
+                return best
+    return best
+
+
+def _relabel(grid):
+    """relabel the numbers of `grid` in order of first appearance
+
+    Returns (relabeled grid, relabel) with relabel[d-1] the new label
+    of number d (as a 9 characters string)
+    """
+    mapping = {}
+    for ch in grid:
+        if ch != '.' and ch not in mapping:
+            mapping[ch] = str(len(mapping) + 1)
+    for ch in '123456789':
+        if ch not in mapping:
+            mapping[ch] = str(len(mapping) + 1)
+    return (''.join(mapping.get(ch, '.') for ch in grid),
+            ''.join(mapping[ch] for ch in '123456789'))
+
+
+def apply_transform(grid, transform):
+    """apply the symmetry `transform` = (transpose, row order, column order,
+    relabel) to the compact `grid`. `relabel` may be None (no relabeling)"""
+    (transpose, row_order, col_order, relabel) = transform
+    if transpose:
+        grid = _transpose(grid)
+    cells = [grid[a0*9 + a1] for a0 in row_order for a1 in col_order]
+    if relabel is not None:
+        cells = [relabel[int(ch)-1] if ch != '.' else '.' for ch in cells]
+    return ''.join(cells)
+
+
+def invert_transform(grid, transform):
+    """apply the inverse of the symmetry `transform` to `grid`
+    (see `apply_transform`)"""
+    (transpose, row_order, col_order, relabel) = transform
+    if relabel is not None:
+        inverse = dict((new, str(d+1)) for d, new in enumerate(relabel))
+        grid = ''.join(inverse.get(ch, '.') for ch in grid)
+    cells = ['.']*81
+    for r, a0 in enumerate(row_order):
+        for c, a1 in enumerate(col_order):
+            cells[a0*9 + a1] = grid[r*9 + c]
+    grid = ''.join(cells)
+    return _transpose(grid) if transpose else grid
+
+
+class SolutionCache(object):
+    """bounded LRU cache of puzzle solutions, keyed by canonical form
+
+    Puzzles seen verbatim are answered from a first LRU map without
+    computing their canonical form. If `path` is given, the canonical
+    entries are also stored in a `shelve` database at this path, which
+    survives the process and is not bounded.
+    """
+
+    def __init__(self, maxsize=10000, path=None):
+        self.maxsize = maxsize
+        # puzzle -> solution, for the puzzles seen verbatim
+        self._exact = OrderedDict()
+        # canonical puzzle -> canonical solution
+        self._canonical = OrderedDict()
+        self._shelf = None
+        if path is not None:
+            # (imported on demand, with `pickle`)
+            import shelve
+            self._shelf = shelve.open(path)
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+
+    def _remember(self, table, key, value):
+        table[key] = value
+        table.move_to_end(key)
+        if len(table) > self.maxsize:
+            table.popitem(last=False)
+
+    def get(self, puzzle):
+        """cached solution of `puzzle` (compact string), or None"""
+        solution = self._exact.get(puzzle)
+        if solution is not None:
+            self._exact.move_to_end(puzzle)
+            self.hits += 1
+            self.exact_hits += 1
+            return solution
+        if len(puzzle) != 81:
+            self.misses += 1
+            return None
+        (canonical, transform) = canonical_form(puzzle)
+        canonical_solution = self._canonical.get(canonical)
+        if canonical_solution is not None:
+            self._canonical.move_to_end(canonical)
+        elif self._shelf is not None and canonical in self._shelf:
+            canonical_solution = self._shelf[canonical]
+            self._remember(self._canonical, canonical, canonical_solution)
+        if canonical_solution is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        solution = invert_transform(canonical_solution, transform)
+        self._remember(self._exact, puzzle, solution)
+        return solution
+
+    def put(self, puzzle, solution):
+        """store the `solution` of `puzzle` (compact strings)"""
+        self._remember(self._exact, puzzle, solution)
+        if len(puzzle) != 81:
+            return
+        (canonical, transform) = canonical_form(puzzle)
+        canonical_solution = apply_transform(solution, transform)
+        self._remember(self._canonical, canonical, canonical_solution)
+        if self._shelf is not None:
+            self._shelf[canonical] = canonical_solution
+
+    def info(self):
+        """dict of the cache counters"""
+        return {'hits': self.hits, 'exact_hits': self.exact_hits,
+                'misses': self.misses, 'size': len(self._canonical),
+                'maxsize': self.maxsize}
+
+    def close(self):
+        """close the disk storage, if any"""
+        if self._shelf is not None:
+            self._shelf.close()
+            self._shelf = None
@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""
+Grid display
+============
+
+Pretty-printing of the Sudoku grids on the terminal, kept out of
+`sudoku_solver` so that importing the solver stays cheap : the
+`Sudoku.print_*` methods load this module on their first call.
+
+The possibilities are colored when the optional `termcolor` module is
+installed, and printed in plain text otherwise.
+"""
+
+from __future__ import division, print_function
+import os.path
+
+from sudoku_solver import _SYMBOLS
+
+try:
+    from termcolor import colored
+except ImportError:
+    def colored(text, color=None, on_color=None, attrs=None):
+        '''dummy colored function'''
+        return text
+
+
+def _solved_count(sudoku):
+    """'Number of solved cells' line of the displays"""
+    (N0, N1) = sudoku.grid_size
+    return 'Number of solved cells : %d/%d' % \
+           (len([c for c in sudoku.cells if c.is_solved()]), N0*N1)
+
+
+def print_grid(sudoku):
+    """displays the Sudoky grid, in a fancier way than print()"""
+    N0 = sudoku.grid_size[0]
+    B0 = sudoku.block_size[0]
+    s = "Sudoku grid '%s':\n\n" % os.path.basename(sudoku.sudoku_file)
+    separator = None
+    for a0 in range(N0):
+        str_list = [str(c) for c in sudoku.get_row_set(a0)]
+        line = sudoku._stacks(str_list, ' ')
+        if separator is None:
+            separator = ''.join('+' if ch == '|' else '-' for ch in line)
+        if a0 % B0 == 0 and a0 != 0:
+                s+= separator + '\n'
+        s += line + '\n'
+    s+= '\n\n' + _solved_count(sudoku)
+
+    print(s)
+#end print_grid
+
+
+def print_all_possibilities(sudoku):
+    """displays the Sudoky grid,
+    with all the available possibilities in each cell
+    """
+    N0 = sudoku.grid_size[0]
+    (B0, B1) = sudoku.block_size
+    # Display colors, depending on the number of remaining possibilities:
+    colors = {1:'green',2:'cyan'}
+    print("Sudoku grid '%s':\n" % os.path.basename(sudoku.sudoku_file))
+    for a0 in range(N0):
+        # Get all possibilities for each cell in the current row:
+        str_list = [ ''.join(_SYMBOLS[p-1] for p in sorted(c.possibilities))
+                     for c in sudoku.get_row_set(a0)]
+        # prepare the color to use for each cell:
+        color_list = [colors.get(len(s)) for s in str_list]
+        # pad all the possibilities strings to fixed with N (9)
+        str_list = [s.center(B0*B1) for s in str_list]
+        # Split the possibilities into B0 (3) lines:
+        for i in range(B0):
+            # Select B1 (3) possibilities for each Cell:
+            str_list_i = [s[B1*i:B1*i+B1] for s in str_list]
+            line = sudoku._stacks(str_list_i, ' ')
+            if a0 % B0 == 0 and a0 != 0 and i == 0:
+                print(''.join('+' if ch == '|' else '-' for ch in line))
+            # Add the color control characters:
+            str_list_i = [colored(s,color)
+                          for s,color in zip(str_list_i, color_list)]
+            print(sudoku._stacks(str_list_i, ' '))
+    print('\n' + _solved_count(sudoku))
+# end pring_all_possibilities
+
+
+def print_nb_possibilities(sudoku):
+    """displays the number of remaining possibilities in each cell
+    a `'` means the cell is solved (that is only one remaining possibility)
+    (numbers above 9 are written like in the grid, see `_SYMBOLS`)
+    """
+    N0 = sudoku.grid_size[0]
+    B0 = sudoku.block_size[0]
+    print("Number of remaining possibilities :\n")
+    for a0 in range(N0):
+        if a0 > 0 and a0 % B0 == 0:
+            print('')
+        str_list = [_SYMBOLS[len(c.possibilities)-1]
+                    for c in sudoku.get_row_set(a0)]
+        str_list = ['\'' if char=='1' else char for char in str_list]
+        s  = sudoku._stacks(str_list, '') + '  '
+        print(s)
+    print('\n' + _solved_count(sudoku))
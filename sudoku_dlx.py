@@ -0,0 +1,241 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""
+Dancing Links backend
+=====================
+
+Exact cover solver (Knuth's Algorithm X with "dancing links"),
+used as an alternative backend of `Sudoku.solve_game`.
+
+A Sudoku grid is encoded as an exact cover problem with
+ * one row per (Cell, number) pair still possible in the grid
+ * one column per constraint, 324 for a 9x9 grid :
+   - each Cell holds exactly one number (81 columns)
+   - each Cell set (row, column, block) holds each number exactly once
+     (27*9 columns, numbered like `Sudoku.get_set`)
+The rows of the solved Cells are selected up front (see
+`DancingLinks.select`), so that the search only deals with the
+unsolved Cells.
+"""
+
+from __future__ import division, print_function
+
+
+class DancingLinks(object):
+    """exact cover matrix stored as a toroidal doubly linked list
+
+    The links are kept in flat integer lists (left, right, up, down)
+    indexed by node number. Node 0 is the root, nodes 1 to `nb_columns`
+    are the column headers and the following nodes are the 1s of the matrix.
+    """
+
+    def __init__(self, nb_columns):
+        """creates an empty matrix with `nb_columns` columns"""
+        n = nb_columns + 1
+        self.L = [i-1 for i in range(n)]
+        self.L[0] = nb_columns
+        self.R = [i+1 for i in range(n)]
+        self.R[nb_columns] = 0
+        self.U = list(range(n))
+        self.D = list(range(n))
+        # column header of each node
+        self.C = list(range(n))
+        # row id of each node (None for headers)
+        self.row_of = [None]*n
+        # number of nodes in each column
+        self.S = [0]*n
+        # row ids selected up front (see `select`), and whether
+        # they conflict with each other
+        self.selected = []
+        self.conflict = False
+
+    def add_row(self, row_id, columns):
+        """append a row with 1s in the given `columns` (0-based)
+        Returns the first node of the row"""
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        first = len(L)
+        for k, col in enumerate(columns):
+            c = col + 1
+            node = first + k
+            # horizontal links (circular within the row)
+            L.append(node-1 if k > 0 else first + len(columns) - 1)
+            R.append(node+1 if k < len(columns)-1 else first)
+            # vertical links : insert at the bottom of column c
+            U.append(U[c])
+            D.append(c)
+            D[U[c]] = node
+            U[c] = node
+            C.append(c)
+            self.row_of.append(row_id)
+            S[c] += 1
+        return first
+
+    def select(self, node):
+        """put the row of `node` in every exact cover, before the search
+        (e.g. a given number) : its columns are covered like when the
+        search chooses the row, so that they are not searched.
+
+        Returns False if the row conflicts with a row selected before
+        (the matrix has then no exact cover, see `conflict`)
+        """
+        L, R, C = self.L, self.R, self.C
+        j = node
+        while True:
+            c = C[j]
+            if R[L[c]] != c:
+                # column already covered by another selected row
+                self.conflict = True
+                return False
+            j = R[j]
+            if j == node:
+                break
+        self.selected.append(self.row_of[node])
+        self._cover(C[node])
+        j = R[node]
+        while j != node:
+            self._cover(C[j])
+            j = R[j]
+        return True
+
+    def _cover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        L[R[c]] = L[c]
+        R[L[c]] = R[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def _uncover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        L[R[c]] = c
+        R[L[c]] = c
+
+    def solutions(self, stats=None, budget=None):
+        """generator of the exact covers of the matrix,
+        each one being a list of row ids (the selected rows first,
+        see `select`).
+
+        `stats` : [optional] dict updated with the search statistics
+                  ('nodes', 'backtracks', 'max_depth'), the nodes and the
+                  depth counting the choices among several rows only
+        `budget` : [optional] `sudoku_solver.SolveBudget` checked at
+                   each node (raising `BudgetExceeded` when exhausted)
+        """
+        if stats is None:
+            stats = {}
+        for key in ('nodes', 'backtracks', 'max_depth'):
+            stats.setdefault(key, 0)
+        if self.conflict:
+            stats['backtracks'] += 1
+            return iter(())
+        return self._search(0, list(self.selected), stats, budget)
+
+    def _search(self, depth, partial, stats, budget):
+        L, R, D, C, S = self.L, self.R, self.D, self.C, self.S
+        stats['max_depth'] = max(stats['max_depth'], depth)
+        if R[0] == 0:
+            # all columns are covered
+            yield list(partial)
+            return
+        # Choose the column with the fewest 1s:
+        best = c = R[0]
+        size = S[c]
+        while c != 0 and size > 1:
+            if S[c] < size:
+                best, size = c, S[c]
+            c = R[c]
+        if size == 0:
+            stats['backtracks'] += 1
+            return
+        # a column with a single 1 forces its row : like the singles of
+        # the Sudoku rules, it is neither a search node nor a guess level
+        guess = size > 1
+        self._cover(best)
+        r = D[best]
+        while r != best:
+            if guess:
+                stats['nodes'] += 1
+                if budget is not None:
+                    budget.add_node()
+            partial.append(self.row_of[r])
+            j = R[r]
+            while j != r:
+                self._cover(C[j])
+                j = R[j]
+            for solution in self._search(depth + guess, partial, stats,
+                                         budget):
+                yield solution
+            j = L[r]
+            while j != r:
+                self._uncover(C[j])
+                j = L[j]
+            partial.pop()
+            r = D[r]
+        self._uncover(best)
+    # end _search
+
+
+def sudoku_matrix(sudoku):
+    """exact cover matrix of the current state of `sudoku`
+
+    Only the (Cell, number) pairs still possible are included,
+    so that both the given numbers and the eliminations already made by
+    the Sudoku rules are taken into account. The rows of the solved Cells
+    are selected up front (see `DancingLinks.select`).
+    Row ids are `cell_index*nb_numbers + (number-1)`
+    """
+    masks = sudoku.masks
+    popcount = sudoku._tables.popcount
+    nb_cells = len(masks)
+    nb_numbers = len(sudoku.units[0])
+    dlx = DancingLinks(nb_cells + len(sudoku.units)*nb_numbers)
+    solved = []
+    for i, mask in enumerate(masks):
+        units = sudoku.cell_units[i]
+        for k in range(nb_numbers):
+            if mask >> k & 1:
+                node = dlx.add_row(i*nb_numbers + k,
+                                   [i] + [nb_cells + n*nb_numbers + k
+                                          for n in units])
+        if popcount[mask] == 1:
+            solved.append(node)
+    for node in solved:
+        if not dlx.select(node):
+            break
+    return dlx
+
+
+def solve_dlx(sudoku, budget=None):
+    """solve `sudoku` with the exact cover backend
+
+    When a solution is found, it is written back into the Cells of `sudoku`
+    `budget` : [optional] see `DancingLinks.solutions`
+
+    Returns (solution, stats) like `Sudoku.search`
+    """
+    stats = {}
+    dlx = sudoku_matrix(sudoku)
+    rows = next(dlx.solutions(stats, budget), None)
+    if rows is None:
+        return (None, stats)
+    nb_numbers = len(sudoku.units[0])
+    cells = sudoku.cells
+    for row_id in rows:
+        (i, k) = divmod(row_id, nb_numbers)
+        cells[i].keep_mask(1 << k)
+    return (sudoku.to_string(), stats)
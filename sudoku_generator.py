@@ -0,0 +1,294 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""
+Puzzle generator
+================
+
+Seeded, fully offline generation of Sudoku puzzles :
+ * full valid grids, from a base pattern shuffled by random symmetries
+   (see `random_transform`)
+ * puzzles with a unique solution, by removing clues from a full grid
+ * variants of well-known hard puzzles, by random symmetries
+ * graded puzzles, streamed by a pool of worker processes
+   (see `grade_puzzle` and `generate_graded`)
+
+Puzzles are compact strings of N*N symbols ("." for empty cells), that is
+81 characters for the 9x9 grids, 256 and 625 for the '16x16' and '25x25'
+kinds.
+The same seed always gives the same puzzles.
+"""
+
+from __future__ import division, print_function
+import multiprocessing
+import random
+from itertools import count as counter
+
+from sudoku_solver import Sudoku, _SYMBOLS
+from sudoku_batch import pool_map
+from sudoku_dlx import sudoku_matrix
+
+# Some puzzles with 17 clues, the minimum for a unique solution
+SEVENTEEN_CLUES = (
+    '.......1.4.........2...........5.4.7..8...3....1.9....3..4..2...5.1........8.6...',
+    '.......12....35......6...7.7.....3.....4..8..1...........12.....8.....4..5....6..',
+    '.......12..36..........7...41..2.......5..3..7.....6..28.....4....3..5...........',
+)
+
+# Hard puzzles, designed against human solvers or brute force search
+ADVERSARIAL = (
+    # "anti brute force" : the solution starts with 987654321
+    '..............3.85..1.2.......5.7.....4...1...9.......5......73..2.1........4...9',
+    # "AI escargot", A. Inkala 2006
+    '1....7.9..3..2...8..96..5....53..9...1..8...26....4...3......1..4......7..7...3..',
+    # A. Inkala 2010
+    '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..',
+)
+
+# kinds of puzzles generated by `generate_corpus`
+KINDS = ('easy', 'hard', '17-clue', 'adversarial', '16x16', '25x25')
+
+# larger grids : kind -> (block size n, number of clues left),
+# enough clues for the search to stay short (minimal 16x16 puzzles
+# already take seconds to generate and to solve)
+LARGE_GRIDS = {'16x16': (4, 115), '25x25': (5, 340)}
+
+# number of clues left in 'easy' puzzles
+EASY_CLUES = 36
+
+# difficulty of a puzzle (see `grade_puzzle`) : hardest rule needed
+# (singles, then subsets of 2 to 4 Cells or numbers), or search
+DIFFICULTIES = ('singles', 'pairs', 'triples', 'quads', 'search')
+
+
+def random_transform(grid, rng):
+    """random equivalent of the compact `grid`, by the symmetries which
+    preserve the Sudoku rules : relabeling of the numbers, permutations
+    of the rows (columns) within a band (stack), permutation of the
+    bands (stacks) and transposition.
+    The grid has n**4 Cells in blocks of n x n (n = 3 for a 9x9 grid)
+    """
+    n = int(round(len(grid) ** 0.25))
+    N = n*n
+    def random_order():
+        bands = rng.sample(range(n), n)
+        return [n*b + r for b in bands for r in rng.sample(range(n), n)]
+    rows = random_order()
+    cols = random_order()
+    digits = list(_SYMBOLS[:N])
+    rng.shuffle(digits)
+    relabel = dict(zip(_SYMBOLS[:N], digits))
+    if rng.random() < 0.5:
+        # transposition
+        grid = ''.join(grid[a1*N + a0] for a0 in range(N) for a1 in range(N))
+    return ''.join(relabel.get(grid[a0*N + a1], '.')
+                   for a0 in rows for a1 in cols)
+
+
+def full_grid(rng, n=3):
+    """random full valid grid, in blocks of n x n (9x9 grid for n = 3)"""
+    N = n*n
+    base = ''.join(_SYMBOLS[(n*(a0 % n) + a0//n + a1) % N]
+                   for a0 in range(N) for a1 in range(N))
+    return random_transform(base, rng)
+
+
+def remove_clues(solution, rng, min_clues=17):
+    """remove clues from the full grid `solution`, in random order, as long
+    as the puzzle keeps a unique solution and more than `min_clues` clues.
+    With `min_clues` = 17, a 9x9 puzzle obtained is minimal (no clue can be
+    removed anymore). The grid may be of any size (see `full_grid`).
+    """
+    puzzle = list(solution)
+    nb_clues = len(puzzle)
+    cells = list(range(len(puzzle)))
+    rng.shuffle(cells)
+    S = Sudoku(verbose=False,
+               block_size=Sudoku._guess_block_size(len(puzzle), None))
+    for i in cells:
+        if nb_clues <= min_clues:
+            break
+        clue = puzzle[i]
+        puzzle[i] = '.'
+        if _is_forced(S, puzzle, i, clue):
+            nb_clues -= 1
+        else:
+            puzzle[i] = clue
+    return ''.join(puzzle)
+
+
+def _is_forced(S, puzzle, i, clue):
+    """is `clue` the only possible number of the empty Cell `i`
+    of the (list) `puzzle`, whose solution is known to exist ?
+    In other words, does the puzzle still have a unique solution.
+
+    The cheap cases (naked or hidden single) are checked first,
+    then the exact cover solver looks for a solution where Cell `i`
+    holds another number. `S` is a Sudoku used as scratch space.
+    """
+    # 1) naked single : the peers hold all the other numbers
+    if len(set(puzzle[j] for j in S.peers[i])) == len(S.units[0]):
+        # (all the numbers but one, and '.', since Cell i is empty)
+        return True
+    # 2) hidden single : `clue` cannot go anywhere else in a Cell set
+    for unit in (S.units[n] for n in S.cell_units[i]):
+        if all(puzzle[j] != '.' or
+               any(puzzle[k] == clue for k in S.peers[j])
+               for j in unit if j != i):
+            return True
+    # 3) exhaustive search, on the possibilities left by the clues
+    #    (which keeps the exact cover matrix small)
+    given = [0 if ch == '.' else 1 << _SYMBOLS.index(ch) for ch in puzzle]
+    full_mask = S._tables.full_mask
+    for j, mask in enumerate(given):
+        if not mask:
+            for k in S.peers[j]:
+                mask |= given[k]
+            mask = full_mask & ~mask
+        S.masks[j] = mask
+    S.masks[i] &= ~(1 << _SYMBOLS.index(clue))
+    if not S.masks[i]:
+        return True
+    return next(sudoku_matrix(S).solutions(), None) is None
+
+
+def grade_puzzle(puzzle):
+    """grade the compact `puzzle` by the effort needed to solve it
+    with the Sudoku rules (see `Sudoku.process_set`) : the rules are
+    applied with the singles alone for as long as they make progress,
+    larger subsets being used only when the smaller ones are stuck.
+    The search finishes the puzzle if the rules are not enough.
+
+    Returns a dict with
+     * 'level' : largest subset size needed by the rules (1 to 4)
+     * 'search_depth' : maximum number of nested guesses (0 if no search)
+     * 'nodes' : number of search nodes (0 if no search)
+     * 'difficulty' : label of the grade (see `DIFFICULTIES`)
+    """
+    S = Sudoku.from_string(puzzle)
+    # the grades only count the rules of the Cell sets,
+    # also during the search (see `Sudoku.apply_rules`)
+    S.rules = ()
+    level = 1
+    S.propagate(max_subset=1)
+    while not S.is_solved():
+        for max_subset in range(2, len(DIFFICULTIES)):
+            before = S.snapshot()
+            S.propagate(max_subset=max_subset)
+            if S.snapshot() != before:
+                level = max(level, max_subset)
+                break
+        else:
+            # the rules are stuck
+            break
+        S.propagate(max_subset=1)
+    if S.is_solved():
+        return {'level': level, 'search_depth': 0, 'nodes': 0,
+                'difficulty': DIFFICULTIES[level-1]}
+    (solution, stats) = S.search()
+    if solution is None:
+        raise ValueError('Puzzle "%s" has no solution' % puzzle)
+    return {'level': level, 'search_depth': stats['max_depth'],
+            'nodes': stats['nodes'], 'difficulty': DIFFICULTIES[-1]}
+
+
+def generate_puzzle(kind, rng):
+    """generate one puzzle of the given `kind` (see `KINDS`)"""
+    if kind == 'easy':
+        return remove_clues(full_grid(rng), rng, min_clues=EASY_CLUES)
+    elif kind == 'hard':
+        return remove_clues(full_grid(rng), rng)
+    elif kind == '17-clue':
+        return random_transform(rng.choice(SEVENTEEN_CLUES), rng)
+    elif kind == 'adversarial':
+        return random_transform(rng.choice(ADVERSARIAL), rng)
+    elif kind in LARGE_GRIDS:
+        (n, nb_clues) = LARGE_GRIDS[kind]
+        return remove_clues(full_grid(rng, n), rng, min_clues=nb_clues)
+    else:
+        raise ValueError('Unknown kind of puzzle "%s"' % kind)
+
+
+def generate_corpus(kind, count, seed=0):
+    """list of `count` puzzles of the given `kind` (see `KINDS`),
+    generated from `seed`"""
+    rng = random.Random('%s-%d' % (kind, seed))
+    return [generate_puzzle(kind, rng) for k in range(count)]
+
+
+def _graded_chunk(start, size, seed, min_clues):
+    """worker task : generate and grade the puzzles number `start` to
+    `start+size-1`. Each one has its own random generator, so that
+    the puzzles do not depend on the number of workers"""
+    puzzles = []
+    for k in range(start, start+size):
+        rng = random.Random('graded-%d-%d' % (seed, k))
+        puzzle = remove_clues(full_grid(rng), rng, min_clues)
+        puzzles.append((puzzle, grade_puzzle(puzzle)))
+    return puzzles
+
+
+def generate_graded(count=None, seed=0, workers=None, difficulty=None,
+                    min_clues=17, chunksize=8):
+    """stream of graded puzzles with a unique solution, generated from
+    `seed` by a pool of `workers` processes (default : number of CPUs,
+    1 means generating in the current process)
+
+    count : number of puzzles to generate (None : endless stream)
+    difficulty : [optional] label or collection of labels (see
+                 `DIFFICULTIES`) of the puzzles to keep, the others
+                 being skipped (they still count in `count`)
+    min_clues : see `remove_clues`
+
+    Generator of (puzzle, grade) pairs (see `grade_puzzle`),
+    always in the same order for the same `seed`
+    """
+    if isinstance(difficulty, str):
+        difficulty = (difficulty,)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    starts = counter(0, chunksize) if count is None else \
+             range(0, count, chunksize)
+    sizes = ((start, chunksize if count is None else
+              min(chunksize, count - start)) for start in starts)
+
+    def keep(chunk):
+        return [(puzzle, grade) for (puzzle, grade) in chunk
+                if difficulty is None or grade['difficulty'] in difficulty]
+
+    if workers <= 1:
+        for (start, size) in sizes:
+            for pair in keep(_graded_chunk(start, size, seed, min_clues)):
+                yield pair
+        return
+
+    tasks = ((start, size, seed, min_clues) for (start, size) in sizes)
+    for chunk in pool_map(_graded_chunk, tasks, workers):
+        for pair in keep(chunk):
+            yield pair
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Generate Sudoku puzzles, one per line. The "graded" '
+                    'puzzles are followed by their difficulty, level of '
+                    'rules and search depth')
+    parser.add_argument('kind', choices=KINDS + ('graded',))
+    parser.add_argument('-n', '--count', type=int, default=10,
+                        help='number of puzzles (0 : endless for "graded")')
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='number of worker processes (default: CPUs)')
+    parser.add_argument('-d', '--difficulty', action='append',
+                        choices=DIFFICULTIES,
+                        help='graded puzzles to keep (repeatable)')
+    args = parser.parse_args()
+    if args.kind == 'graded':
+        for (puzzle, grade) in generate_graded(args.count or None, args.seed,
+                                               args.workers, args.difficulty):
+            print('%s %s %d %d' % (puzzle, grade['difficulty'],
+                                   grade['level'], grade['search_depth']),
+                  flush=True)
+    else:
+        for puzzle in generate_corpus(args.kind, args.count, args.seed):
+            print(puzzle)
@@ -0,0 +1,413 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""
+Sudoku grids input/output
+=========================
+
+Streaming reader and writer of Sudoku grid files, so that puzzle corpora
+of any size can be processed in constant memory.
+
+Grids are exchanged as compact 81 characters strings
+(row-major order, "." for empty cells), see `sudoku_batch.compact_grid`.
+
+Two text formats are accepted by `read_grids`, even mixed in one file :
+ * one grid per line, as 81 symbols. Any symbol which is not a digit
+   from 1 to 9 is an empty cell ("0" and "." being the usual choices)
+ * grids laid out on several lines, like the files in `sudoku-examples/`.
+   Only digits, "." and "0" are meaningful, other characters being
+   formatting. A new grid starts every 81 meaningful symbols.
+Lines starting with "#" are comments.
+
+Grids can also be stored in a compact binary format (see `write_packed`,
+`read_packed` and `PackedGrids`), made of an 8 bytes header followed by
+fixed-size records, one per grid. There are two kinds of records :
+ * 'givens' : the number of each cell (0 for an empty cell) on 4 bits,
+   that is 41 bytes for a 9x9 grid
+ * 'candidates' : the candidate mask of each cell (see `Sudoku.masks`)
+   on 9 bits, that is 92 bytes for a 9x9 grid, so that intermediate
+   states of the solver can be saved as well
+Cell k of a record is stored in the bits k*b to k*b+b-1 (b bits per cell)
+of the record read as a little-endian integer. Larger grids use wider
+fields (5 bits per given and 16 bits per mask for a 16x16 grid).
+"""
+
+from __future__ import division, print_function
+import gzip
+import io
+import mmap
+import struct
+from array import array
+
+# number of cells of a grid
+GRID_CELLS = 81
+
+_SOLVED_CHR = '123456789'
+_MEANINGFUL_CHR = '1234567890.'
+
+
+def _open(source, mode):
+    """open a filename (transparently gunzipped if ending with ".gz"),
+    or return `source` itself if it is already a file object.
+    Returns (file, should_close)"""
+    if hasattr(source, 'read') or hasattr(source, 'write'):
+        return (source, False)
+    if source.endswith('.gz'):
+        return (gzip.open(source, mode if 'b' in mode else mode + 't'), True)
+    return (io.open(source, mode), True)
+
+
+def read_grids(source):
+    """generator of the grids stored in `source` (filename or text file
+    object), as 81 characters strings. Grids are read lazily, line by line.
+
+    Raises ValueError if the file ends in the middle of a grid.
+    """
+    (f, should_close) = _open(source, 'r')
+    try:
+        pending = []
+        for (line_number, line) in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if not pending and len(line) == GRID_CELLS:
+                # one grid per line format
+                yield ''.join(ch if ch in _SOLVED_CHR else '.'
+                              for ch in line)
+                continue
+            # multi-line grid format
+            pending.extend('.' if ch == '0' else ch
+                           for ch in line if ch in _MEANINGFUL_CHR)
+            while len(pending) >= GRID_CELLS:
+                yield ''.join(pending[:GRID_CELLS])
+                del pending[:GRID_CELLS]
+        if pending:
+            raise ValueError('Incomplete grid at the end of the input '
+                             '(%d meaningful symbols instead of %d)' %
+                             (len(pending), GRID_CELLS))
+    finally:
+        if should_close:
+            f.close()
+
+
+def write_grids(destination, grids, unsolved='-'):
+    """write `grids` one per line into `destination` (filename or text
+    file object), consuming the iterable lazily.
+
+    grids : iterable of 81 characters strings or Sudoku instances.
+            None items (e.g. grids without solution) are written as
+            the `unsolved` string.
+
+    Returns the number of grids written
+    """
+    (f, should_close) = _open(destination, 'w')
+    nb_grids = 0
+    try:
+        for grid in grids:
+            if grid is None:
+                grid = unsolved
+            elif not isinstance(grid, str):
+                grid = grid.to_string()
+            f.write(grid + '\n')
+            nb_grids += 1
+    finally:
+        if should_close:
+            f.close()
+    return nb_grids
+
+
+# Compact binary format (see the module documentation)
+PACKED_KINDS = ('givens', 'candidates')
+# header : magic, format version, kind (index in PACKED_KINDS),
+# block side n (3 for a 9x9 grid), padding
+_HEADER = struct.Struct('<4sBBBx')
+_MAGIC = b'SDKP'
+_VERSION = 1
+# usual suffix of the packed files
+PACKED_SUFFIX = '.sdk'
+
+
+def _layout(kind, n):
+    """(number of cells, bits per cell, record size in bytes) of the
+    records of `kind` for a grid of blocks of n x n"""
+    if kind not in PACKED_KINDS:
+        raise ValueError('Unknown kind of records "%s"' % kind)
+    nb_numbers = n*n
+    nb_cells = nb_numbers*nb_numbers
+    if kind == 'givens':
+        bits = nb_numbers.bit_length()
+    else:
+        bits = nb_numbers
+    return (nb_cells, bits, (nb_cells*bits + 7) // 8)
+
+
+def record_size(kind='givens', n=3):
+    """size in bytes of one record of `kind` (see `PACKED_KINDS`)
+    for a grid of blocks of n x n"""
+    return _layout(kind, n)[2]
+
+
+def _block_side(nb_cells):
+    """block side n of a grid of n**4 cells"""
+    n = int(round(nb_cells ** 0.25))
+    if n**4 != nb_cells:
+        raise ValueError('Grid of wrong size (%d cells is not n**4)' %
+                         nb_cells)
+    return n
+
+
+def _pack(values, bits, size):
+    """pack the integers `values` on `bits` bits each into `size` bytes"""
+    packed = 0
+    for v in reversed(values):
+        packed = packed << bits | v
+    return packed.to_bytes(size, 'little')
+
+
+def _unpack(record, bits, nb_values):
+    """list of the `nb_values` integers of `bits` bits packed in `record`"""
+    packed = int.from_bytes(record, 'little')
+    field = (1 << bits) - 1
+    return [packed >> (bits*k) & field for k in range(nb_values)]
+
+
+# 9x9 givens (4 bits per cell) are converted with byte translation
+# tables : symbol -> number, number -> symbol, byte -> low / high nibble
+_TO_NUMBER = bytes(_SOLVED_CHR.find(chr(b)) + 1 for b in range(256))
+_TO_SYMBOL = (b'.' + _SOLVED_CHR.encode('ascii')).ljust(256, b'.')
+_LOW_NIBBLE = bytes(b & 15 for b in range(256))
+_HIGH_NIBBLE = bytes(b >> 4 for b in range(256))
+
+
+def pack_givens(grid):
+    """'givens' record (bytes) of `grid`, a compact string
+    (see `Sudoku.to_string`) or a Sudoku instance (its solved Cells)"""
+    if not isinstance(grid, str):
+        grid = grid.to_string()
+    n = _block_side(len(grid))
+    (nb_cells, bits, size) = _layout('givens', n)
+    if n == 3:
+        numbers = grid.encode('ascii').translate(_TO_NUMBER) + b'\0'
+        # as the numbers hold on 4 bits, shifting the integer of the odd
+        # cells moves each of them to the high nibble of its byte
+        return (int.from_bytes(numbers[0::2], 'little') |
+                int.from_bytes(numbers[1::2], 'little') << 4
+                ).to_bytes(size, 'little')
+    from sudoku_solver import _SYMBOLS
+    numbers = _SYMBOLS[:n*n]
+    return _pack([numbers.find(ch) + 1 for ch in grid], bits, size)
+
+
+def unpack_givens(record, n=3):
+    """compact string of a 'givens' record ("." for empty cells)"""
+    (nb_cells, bits, size) = _layout('givens', n)
+    if n == 3:
+        record = bytes(record)
+        numbers = bytearray(2*size)
+        numbers[0::2] = record.translate(_LOW_NIBBLE)
+        numbers[1::2] = record.translate(_HIGH_NIBBLE)
+        return numbers[:nb_cells].translate(_TO_SYMBOL).decode('ascii')
+    from sudoku_solver import _SYMBOLS
+    symbols = '.' + _SYMBOLS[:n*n]
+    return ''.join(symbols[v] if v < len(symbols) else '.'
+                   for v in _unpack(record, bits, nb_cells))
+
+
+def pack_candidates(grid):
+    """'candidates' record (bytes) of `grid`, a Sudoku instance
+    or a sequence of candidate masks (see `Sudoku.masks`)"""
+    masks = getattr(grid, 'masks', grid)
+    n = _block_side(len(masks))
+    (nb_cells, bits, size) = _layout('candidates', n)
+    return _pack(masks, bits, size)
+
+
+def unpack_candidates(record, n=3):
+    """candidate masks of a 'candidates' record, as an array of the
+    same type as `Sudoku.masks` (to be copied with `S.masks[:] = masks`)"""
+    from sudoku_solver import _mask_typecode
+    (nb_cells, bits, size) = _layout('candidates', n)
+    return array(_mask_typecode(n*n), _unpack(record, bits, nb_cells))
+
+
+_PACKERS = {'givens': pack_givens, 'candidates': pack_candidates}
+_UNPACKERS = {'givens': unpack_givens, 'candidates': unpack_candidates}
+
+
+def _read_header(header):
+    """(kind, n) of a packed file header"""
+    if len(header) < _HEADER.size:
+        raise ValueError('Truncated header of packed grids')
+    (magic, version, kind, n) = _HEADER.unpack(bytes(header[:_HEADER.size]))
+    if magic != _MAGIC or version != _VERSION or kind >= len(PACKED_KINDS):
+        raise ValueError('Not a packed grids file (version %d)' % _VERSION)
+    return (PACKED_KINDS[kind], n)
+
+
+def packed_kind(source):
+    """(kind, n) of the packed file `source` (filename or binary file
+    object, read from its current position), see `PACKED_KINDS`.
+    An empty file is taken as 'givens' of a 9x9 grid."""
+    (f, should_close) = _open(source, 'rb')
+    try:
+        header = f.read(_HEADER.size)
+    finally:
+        if should_close:
+            f.close()
+    if not header:
+        return ('givens', 3)
+    return _read_header(header)
+
+
+def write_packed(destination, grids, kind='givens'):
+    """write `grids` as packed records of `kind` (see `PACKED_KINDS`) into
+    `destination` (filename or binary file object), consuming the iterable
+    lazily. All the grids must have the same size.
+
+    grids : iterable of compact strings or Sudoku instances for 'givens',
+            of Sudoku instances or mask sequences for 'candidates'
+
+    Returns the number of grids written
+    """
+    if kind not in PACKED_KINDS:
+        raise ValueError('Unknown kind of records "%s"' % kind)
+    pack = _PACKERS[kind]
+    (f, should_close) = _open(destination, 'wb')
+    nb_grids = 0
+    size = None
+    try:
+        for grid in grids:
+            record = pack(grid)
+            if size is None:
+                size = len(record)
+                n = _block_side(len(getattr(grid, 'masks', grid)))
+                f.write(_HEADER.pack(_MAGIC, _VERSION,
+                                     PACKED_KINDS.index(kind), n))
+            elif len(record) != size:
+                raise ValueError('Grid %d is not of the size of the first '
+                                 'one' % nb_grids)
+            f.write(record)
+            nb_grids += 1
+    finally:
+        if should_close:
+            f.close()
+    return nb_grids
+
+
+def read_packed(source, decode=True, chunk_records=4096):
+    """generator of the grids stored in the packed file `source`
+    (filename or binary file object), read `chunk_records` records at a
+    time : compact strings for 'givens', mask arrays for 'candidates'
+    (see `unpack_givens` and `unpack_candidates`).
+
+    With `decode` False, the raw records are given as read-only
+    `memoryview` slices of the chunk buffer, without copy.
+    An empty file holds no grids.
+
+    Raises ValueError if the file ends in the middle of a record.
+    """
+    (f, should_close) = _open(source, 'rb')
+    try:
+        header = f.read(_HEADER.size)
+        if not header:
+            return
+        (kind, n) = _read_header(header)
+        size = record_size(kind, n)
+        unpack = _UNPACKERS[kind]
+        while True:
+            chunk = f.read(size*chunk_records)
+            if len(chunk) % size:
+                raise ValueError('Incomplete record at the end of the '
+                                 'input (%d bytes instead of %d)' %
+                                 (len(chunk) % size, size))
+            view = memoryview(chunk)
+            for start in range(0, len(chunk), size):
+                record = view[start:start+size]
+                yield unpack(record, n) if decode else record
+            if len(chunk) < size*chunk_records:
+                break
+    finally:
+        if should_close:
+            f.close()
+
+
+class PackedGrids(object):
+    """random access to the records of packed grids held in memory
+    (bytes, bytearray, mmap... see `write_packed`), without copy :
+    `records[k]` is a read-only memoryview of the k-th record and
+    `records.decode(k)` its grid (see `read_packed`).
+
+    Use `PackedGrids.open` to map a packed file in memory.
+    """
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        if view.format != 'B':
+            view = view.cast('B')
+        (self.kind, self.n) = _read_header(view)
+        self.record_size = record_size(self.kind, self.n)
+        self.records = view[_HEADER.size:].toreadonly()
+        view.release()
+        if len(self.records) % self.record_size:
+            raise ValueError('Incomplete record at the end of the buffer')
+        self._unpack = _UNPACKERS[self.kind]
+        self._mmap = None
+
+    @classmethod
+    def open(cls, path):
+        """packed grids of the file `path`, mapped in memory"""
+        with io.open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        packed = cls(mapped)
+        packed._mmap = mapped
+        return packed
+
+    def __len__(self):
+        return len(self.records) // self.record_size
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError('Record %d out of range' % k)
+        return self.records[k*self.record_size:(k+1)*self.record_size]
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def decode(self, k):
+        """grid of the k-th record (see `read_packed`)"""
+        return self._unpack(self[k], self.n)
+
+    def close(self):
+        """release the buffer (and the file mapping, if any).
+        The records taken from it must have been released before."""
+        self.records.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        description='Convert grid files between the text format '
+                    '(one grid per line) and the packed givens format')
+    parser.add_argument('action', choices=['pack', 'unpack'])
+    parser.add_argument('input', help='input file ("-" for standard input)')
+    parser.add_argument('output', help='output file ("-" for standard output)')
+    args = parser.parse_args()
+
+    if args.action == 'pack':
+        source = sys.stdin if args.input == '-' else args.input
+        destination = (sys.stdout.buffer if args.output == '-'
+                       else args.output)
+        write_packed(destination, read_grids(source))
+    else:
+        source = sys.stdin.buffer if args.input == '-' else args.input
+        if source != sys.stdin.buffer and packed_kind(source)[0] != 'givens':
+            parser.error('%s does not hold packed givens' % args.input)
+        destination = sys.stdout if args.output == '-' else args.output
+        write_grids(destination, read_packed(source))
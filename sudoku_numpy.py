@@ -0,0 +1,275 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""
+Vectorized batch propagation
+============================
+
+Apply the Sudoku rules of `Sudoku.process_set` to thousands of grids
+at once with NumPy (optional dependency of this program).
+
+N grids are held as an (N, 81) uint16 array of candidate bitmasks, with
+the same encoding as `Sudoku.masks` (number d possible if bit d-1 is set).
+Each propagation step looks at the 27 Cell sets of every grid together :
+ * "Injectivity" : naked singles and subsets of 2 to 4 cells
+ * "Surjectivity" : hidden singles and subsets of 2 to 4 numbers
+and is repeated on the grids which made some progress.
+Grids which are still unsolved after that are finished by the scalar
+solver (`Sudoku.solve_game`), starting from their propagated state.
+"""
+
+from __future__ import division, print_function
+from array import array
+from itertools import combinations
+
+import numpy as np
+
+from sudoku_solver import (Sudoku, _build_index, _FULL_MASK, _POPCOUNT,
+                           _LOWEST_DIGIT, _MAX_SUBSET)
+
+# (27, 9) cell indices of each Cell set, numbered like `Sudoku.get_set`
+_UNITS = np.array(_build_index(Sudoku.grid_size, Sudoku.block_size)[0])
+_NB_UNIT_TYPES = 3 # rows, columns and blocks
+_POP = np.frombuffer(bytes(_POPCOUNT), dtype=np.uint8)
+_LOWEST = np.frombuffer(bytes(_LOWEST_DIGIT), dtype=np.uint8)
+_SHIFTS = np.arange(9, dtype=np.uint16)
+
+# _COMBOS[k] : (c, k) array of the k-combinations of range(9)
+_COMBOS = [None] + [np.array(list(combinations(range(9), k)))
+                    for k in range(1, _MAX_SUBSET+1)]
+# _COMBO_MASKS[k] : (c,) bitmask of each k-combination
+_COMBO_MASKS = [None] + [np.bitwise_or.reduce(
+                             np.left_shift(1, _COMBOS[k]), axis=1
+                         ).astype(np.uint16)
+                         for k in range(1, _MAX_SUBSET+1)]
+# _MEMBERS[k] : (9, c) boolean, is position p in each k-combination
+_MEMBERS = [None] + [(_COMBOS[k][None, :, :] ==
+                      np.arange(9)[:, None, None]).any(axis=2)
+                     for k in range(1, _MAX_SUBSET+1)]
+
+
+def grids_to_masks(grids):
+    """(N, 81) uint16 candidate masks of a list of compact grid strings
+    (81 symbols, digits from 1 to 9 being given numbers)"""
+    symbols = np.frombuffer(''.join(grids).encode('ascii'), dtype=np.uint8)
+    values = symbols.reshape(-1, 81).astype(np.int16) - ord('0')
+    given = (values >= 1) & (values <= 9)
+    return np.where(given, np.left_shift(1, np.clip(values-1, 0, 8)),
+                    _FULL_MASK).astype(np.uint16)
+
+
+def packed_to_masks(packed, start=0, stop=None):
+    """(N, 81) uint16 candidate masks of the records `start` to `stop`-1
+    of 9x9 packed grids (a `sudoku_io.PackedGrids` instance), decoded
+    in bulk from the packed buffer"""
+    if packed.n != 3:
+        raise ValueError('Only 9x9 grids are supported')
+    stop = len(packed) if stop is None else min(stop, len(packed))
+    size = packed.record_size
+    data = np.frombuffer(packed.records[start*size:stop*size],
+                         dtype=np.uint8).reshape(-1, size)
+    if packed.kind == 'givens':
+        numbers = np.empty((len(data), 2*size), dtype=np.uint8)
+        numbers[:, 0::2] = data & 15
+        numbers[:, 1::2] = data >> 4
+        values = numbers[:, :81].astype(np.int16)
+        given = (values >= 1) & (values <= 9)
+        return np.where(given, np.left_shift(1, np.clip(values-1, 0, 8)),
+                        _FULL_MASK).astype(np.uint16)
+    bits = np.unpackbits(data, axis=1, bitorder='little')[:, :81*9]
+    return (bits.reshape(-1, 81, 9).astype(np.uint16) <<
+            _SHIFTS).sum(axis=2).astype(np.uint16)
+
+
+def masks_to_strings(masks):
+    """compact grid strings (see `Sudoku.to_string`) of (N, 81) masks"""
+    solved = _POP[masks] == 1
+    codes = np.where(solved, ord('0') + _LOWEST[masks], ord('.'))
+    return [row.tobytes().decode('ascii')
+            for row in codes.astype(np.uint8)]
+
+
+def _naked_eliminations(unit_masks, max_subset=_MAX_SUBSET):
+    """injectivity rule on (n, 27, 9) unit masks,
+    for subsets of up to `max_subset` cells
+
+    Returns (removal, invalid) : the (n, 27, 9) masks of the possibilities
+    to remove from each cell and the (n,) flags of contradictory grids
+    """
+    n = unit_masks.shape[0]
+    unsolved = _POP[unit_masks] > 1
+    removal = np.zeros_like(unit_masks)
+    invalid = np.zeros(n, dtype=bool)
+    for k in range(1, max_subset+1):
+        combos = _COMBOS[k]
+        union = np.bitwise_or.reduce(unit_masks[:, :, combos], axis=3)
+        count = _POP[union]
+        if k == 1:
+            # fully solved cells
+            valid = count == 1
+        else:
+            eligible = unsolved[:, :, combos].all(axis=3)
+            valid = eligible & (count == k)
+            invalid |= (eligible & (count < k)).any(axis=(1, 2))
+        contrib = np.where(valid, union, 0).astype(np.uint16)
+        for p in range(9):
+            outside = ~_MEMBERS[k][p]
+            removal[:, :, p] |= np.bitwise_or.reduce(contrib[:, :, outside],
+                                                     axis=2)
+    return (removal, invalid)
+
+
+def _hidden_placements(unit_masks, max_subset=_MAX_SUBSET):
+    """surjectivity rule on (n, 27, 9) unit masks,
+    for subsets of up to `max_subset` numbers
+
+    Returns (keep, invalid) : the (n, 27, 9) masks of the possibilities
+    to keep in each cell and the (n,) flags of contradictory grids
+    """
+    # places[:, u, d] : bitmask of the positions where number d+1 is possible
+    bits = (unit_masks[:, :, :, None] >> _SHIFTS) & 1
+    places = (bits << _SHIFTS[:, None]).sum(axis=2).astype(np.uint16)
+    places_count = _POP[places]
+    invalid = (places_count == 0).any(axis=(1, 2))
+    keep = np.full_like(unit_masks, _FULL_MASK)
+    for k in range(1, max_subset+1):
+        combos = _COMBOS[k]
+        union = np.bitwise_or.reduce(places[:, :, combos], axis=3)
+        count = _POP[union]
+        if k == 1:
+            valid = count == 1
+        else:
+            eligible = ((places_count >= 2) &
+                        (places_count <= _MAX_SUBSET))[:, :, combos].all(axis=3)
+            valid = eligible & (count == k)
+            invalid |= (eligible & (count < k)).any(axis=(1, 2))
+        for p in range(9):
+            here = valid & ((union >> p) & 1).astype(bool)
+            keep[:, :, p] &= np.bitwise_and.reduce(
+                np.where(here, _COMBO_MASKS[k], _FULL_MASK).astype(np.uint16),
+                axis=2)
+    return (keep, invalid)
+
+
+def _units_to_cells(unit_values, init, ufunc):
+    """combine (n, 27, 9) per Cell set values into (n, 81) per cell values
+    with `ufunc` (each cell belongs to one set of each type)"""
+    n = unit_values.shape[0]
+    cell_values = np.full((n, 81), init, dtype=np.uint16)
+    nb_sets = len(_UNITS) // _NB_UNIT_TYPES
+    for t in range(_NB_UNIT_TYPES):
+        sets = slice(t*nb_sets, (t+1)*nb_sets)
+        index = _UNITS[sets].ravel()
+        cell_values[:, index] = ufunc(cell_values[:, index],
+                                      unit_values[:, sets, :].reshape(n, 81))
+    return cell_values
+
+
+def _propagation_step(cell_masks, max_subset):
+    """one application of the rules to (n, 81) masks, for subsets of
+    up to `max_subset` cells or numbers
+
+    Returns (new_masks, contradiction) : the new (n, 81) masks and
+    the (n,) flags of contradictory grids
+    """
+    unit_masks = cell_masks[:, _UNITS]
+    (removal, invalid_naked) = _naked_eliminations(unit_masks, max_subset)
+    (keep, invalid_hidden) = _hidden_placements(unit_masks, max_subset)
+    new_masks = (cell_masks
+                 & ~_units_to_cells(removal, 0, np.bitwise_or)
+                 & _units_to_cells(keep, _FULL_MASK, np.bitwise_and))
+    contradiction = (invalid_naked | invalid_hidden |
+                     (new_masks == 0).any(axis=1))
+    return (new_masks, contradiction)
+
+
+def propagate_batch(masks):
+    """apply the Sudoku rules to each grid of the (N, 81) candidate `masks`
+    until there is no more progress, all the grids being processed together.
+    The cheap singles rules are applied alone first, the subsets rules
+    only being used on the grids where the singles make no more progress.
+
+    Returns (masks, invalid) : the propagated (N, 81) masks (a new array)
+    and the (N,) boolean flags of the contradictory grids
+    """
+    masks = np.array(masks, dtype=np.uint16)
+    active = np.ones(len(masks), dtype=bool)
+    invalid = np.zeros(len(masks), dtype=bool)
+    while active.any():
+        index = np.nonzero(active)[0]
+        cell_masks = masks[index]
+        # 1) singles only
+        (new_masks, contradiction) = _propagation_step(cell_masks, 1)
+        progress = (new_masks != cell_masks).any(axis=1) & ~contradiction
+        # 2) all the subsets, where the singles are stuck
+        stuck = ~progress & ~contradiction
+        if stuck.any():
+            (new_stuck, contradiction_stuck) = _propagation_step(
+                cell_masks[stuck], _MAX_SUBSET)
+            new_masks[stuck] = new_stuck
+            contradiction[stuck] = contradiction_stuck
+            progress[stuck] = ((new_stuck != cell_masks[stuck]).any(axis=1)
+                               & ~contradiction_stuck)
+        masks[index[progress]] = new_masks[progress]
+        invalid[index[contradiction]] = True
+        active[index[~progress]] = False
+    return (masks, invalid)
+
+
+def solve_batch(grids, search=True, chunksize=1024):
+    """solve an iterable of compact grid strings (see
+    `sudoku_batch.compact_grid`), `chunksize` grids at a time :
+    vectorized propagation first, then the scalar solver for the grids
+    which are still unsolved (see `Sudoku.solve_game`)
+
+    Generator of the solutions (81 characters strings) in input order,
+    None for the grids which could not be solved (without `search`, a
+    contradiction met by the scalar solver raises `Contradiction`)
+    """
+    chunk = []
+    for grid in grids:
+        chunk.append(grid)
+        if len(chunk) == chunksize:
+            for solution in _solve_chunk(chunk, search):
+                yield solution
+            chunk = []
+    if chunk:
+        for solution in _solve_chunk(chunk, search):
+            yield solution
+
+
+def solve_packed(packed, search=True, chunksize=1024):
+    """solve 9x9 packed grids (a `sudoku_io.PackedGrids` instance, either
+    givens or candidate states) like `solve_batch`, the records being
+    decoded in bulk (see `packed_to_masks`)
+
+    Generator of the solutions in record order (see `solve_batch`)
+    """
+    for start in range(0, len(packed), chunksize):
+        for solution in _solve_masks(
+                packed_to_masks(packed, start, start+chunksize), search):
+            yield solution
+
+
+def _solve_chunk(grids, search):
+    """list of the solutions of a list of compact grids"""
+    return _solve_masks(grids_to_masks(grids), search)
+
+
+def _solve_masks(masks, search):
+    """list of the solutions of (n, 81) candidate masks"""
+    (masks, invalid) = propagate_batch(masks)
+    solved = (_POP[masks] == 1).all(axis=1)
+    strings = masks_to_strings(masks)
+    solutions = []
+    for j, string in enumerate(strings):
+        if invalid[j]:
+            solutions.append(None)
+        elif solved[j]:
+            solutions.append(string)
+        else:
+            # fall back to the scalar solver
+            S = Sudoku(verbose=False)
+            S.masks[:] = array('H', masks[j].tolist())
+            (is_solved, nb_iter) = S.solve_game(search=search)
+            solutions.append(S.to_string() if is_solved else None)
+    return solutions
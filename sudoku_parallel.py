@@ -0,0 +1,296 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""
+Parallel search
+===============
+
+Search of a single hard grid shared by a pool of worker processes, to cut
+the latency of the grids which need a long search (`sudoku_batch` rather
+spreads many grids over the workers)::
+
+    S.solve_game(search=True, workers=4)
+
+The top levels of the search tree are expanded in the calling process,
+breadth first, until there are enough branches (`split` per worker) : each
+branch is the grid state after a few guesses on the most constrained Cells
+(see `Sudoku._search`). The branches are then sent to the workers as
+compact snapshots (see `Sudoku.snapshot`) and searched like in
+`Sudoku.search`, with the same rules :
+ * `search_parallel` : the first solution found wins, the other workers
+   giving up through their budget (see `SolveBudget`)
+ * `count_solutions_parallel` : the solutions of all the branches are
+   counted together, up to a limit (uniqueness checks)
+
+The pools are kept from one call to the next (see `SearchPool`),
+so that only the first call pays for starting the workers.
+"""
+
+from __future__ import division, print_function
+import atexit
+import multiprocessing
+import threading
+import time
+from collections import deque
+
+from sudoku_solver import (Sudoku, SolveBudget, BudgetExceeded,
+                           Contradiction)
+
+# number of branches searched per worker, for load balancing
+DEFAULT_SPLIT = 4
+
+# period (seconds) of the budget checks in the calling process,
+# while waiting for the workers
+POLL_PERIOD = 0.05
+
+# worker process state :
+# number of the last cancelled search, shared with the calling process
+_cancelled = None
+# scratch Sudoku of each block size
+_games = {}
+
+
+def _init_worker(cancelled):
+    """initializer of the worker processes"""
+    global _cancelled
+    _cancelled = cancelled
+
+
+def _search_branch(task):
+    """worker task : search the branch of the snapshot `token`, in which
+    Cell `guess` was just guessed (see `split_search`), for up to `limit`
+    solutions. The search gives up when its time or node budget is
+    exhausted, or as soon as the search number `generation` is cancelled.
+
+    Returns (index, solutions, stats, reason), `reason` being the one of
+    the budget (None if the branch was fully searched)
+    """
+    (generation, index, block_size, token, guess, rules, limit,
+     timeout, node_budget) = task
+    S = _games.get(block_size)
+    if S is None:
+        S = _games[block_size] = Sudoku(verbose=False, block_size=block_size)
+    S.restore(token)
+    S.rules = rules
+    S.budget = SolveBudget(timeout, node_budget,
+                           cancel=lambda: _cancelled.value >= generation)
+    stats = {'nodes': 0, 'backtracks': 0, 'max_depth': 0}
+    solutions = []
+    try:
+        for solution in S._search(0, stats, guess):
+            solutions.append(solution)
+            if limit is not None and len(solutions) >= limit:
+                break
+    except BudgetExceeded:
+        pass
+    return (index, solutions, stats, S.budget.reason)
+
+
+def split_search(sudoku, nb_branches, stats, limit=1):
+    """expand the top of the search tree of `sudoku` breadth first, until
+    there are `nb_branches` branches left to search (fewer if the tree is
+    smaller). The grid of `sudoku` is left unchanged.
+
+    stats : dict of search statistics, updated like in `Sudoku.search`
+    limit : number of solutions after which the expansion stops
+            (no limit if None)
+
+    Returns (branches, solutions) :
+     * branches : list of (token, guess, depth) where `token` is the
+       snapshot of the grid after the guess on Cell `guess`, `depth`
+       guesses below the root (the branch is not propagated yet)
+     * solutions : solutions met on the way
+    """
+    S = sudoku.copy()
+    budget = sudoku.budget
+    frontier = deque([(S.snapshot(), None, 0)])
+    solutions = []
+    while frontier and len(frontier) < nb_branches:
+        (token, guess, depth) = frontier.popleft()
+        # one node of the search (see `Sudoku._search`)
+        stats['nodes'] += 1
+        stats['max_depth'] = max(stats['max_depth'], depth)
+        if budget is not None:
+            budget.add_node()
+        S.restore(token)
+        try:
+            if guess is None:
+                S.apply_rules()
+            else:
+                S.apply_rules(S.cell_units[guess])
+            S.check_units()
+        except Contradiction:
+            stats['backtracks'] += 1
+            continue
+        best = S._choose_cell()
+        if best is None:
+            solutions.append(S.to_string())
+            if limit is not None and len(solutions) >= limit:
+                break
+            continue
+        mask = S.masks[best]
+        for k in S._tables.bit_indices[mask]:
+            S.masks[best] = 1 << k
+            frontier.append((S.snapshot(), best, depth+1))
+        S.masks[best] = mask
+    return (list(frontier), solutions)
+
+
+class SearchPool(object):
+    """pool of worker processes sharing the searches of single grids
+    (see the module documentation)
+
+    The worker processes are started on the first search and stopped by
+    `close`. The searches of one pool run one at a time.
+    """
+
+    def __init__(self, workers=None, split=DEFAULT_SPLIT):
+        """workers : number of worker processes (default : number of CPUs)
+        split : number of branches searched per worker
+        """
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self.workers = workers
+        self.split = split
+        self._pool = None
+        # number of the last search, and of the last cancelled one
+        self._generation = 0
+        self._cancelled = multiprocessing.RawValue('q', 0)
+        self._lock = threading.Lock()
+
+    def search(self, sudoku):
+        """solve `sudoku` like `Sudoku.search`, with the rules and the
+        budget of the game. When a solution is found, the grid is left
+        in the solved state, otherwise it is left unchanged.
+
+        If the game has several solutions, the one found first by the
+        workers is kept.
+
+        Returns (solution, stats) like `Sudoku.search`
+        """
+        (solutions, stats) = self._run(sudoku, 1)
+        if not solutions:
+            return (None, stats)
+        sudoku._use_solution(solutions[0])
+        return (solutions[0], stats)
+
+    def count_solutions(self, sudoku, limit=2):
+        """count the solutions of `sudoku` like `Sudoku.count_solutions`,
+        up to `limit` (no limit if None). The grid is left unchanged."""
+        if limit is not None and limit <= 0:
+            return 0
+        return len(self._run(sudoku, limit)[0])
+
+    def _run(self, sudoku, limit):
+        """search the branches of `sudoku` (see `split_search`) in the
+        workers, up to `limit` solutions. The search statistics are
+        available in `sudoku.search_stats`.
+
+        Returns (solutions, stats)
+
+        Raises BudgetExceeded if the budget of the game is exhausted
+        before the search is complete
+        """
+        stats = {'nodes': 0, 'backtracks': 0, 'max_depth': 0}
+        sudoku.search_stats = stats
+        budget = sudoku.budget
+        (branches, solutions) = split_search(
+            sudoku, self.workers*self.split, stats, limit)
+        if not branches or (limit is not None and len(solutions) >= limit):
+            return (solutions, stats)
+        timeout = node_budget = None
+        if budget is not None:
+            if budget.deadline is not None:
+                timeout = max(budget.deadline - time.monotonic(), 0.)
+            if budget.node_budget is not None:
+                # (limit of each branch, the total being checked
+                # as the branches complete)
+                node_budget = budget.node_budget - budget.nodes
+        with self._lock:
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(self.workers, _init_worker,
+                                                  (self._cancelled,))
+            self._generation += 1
+            generation = self._generation
+            tasks = [(generation, index, sudoku.block_size, token, guess,
+                      sudoku.rules,
+                      None if limit is None else limit - len(solutions),
+                      timeout, node_budget)
+                     for index, (token, guess, depth) in enumerate(branches)]
+            results = self._pool.imap_unordered(_search_branch, tasks)
+            reason = None
+            try:
+                for k in range(len(tasks)):
+                    while True:
+                        try:
+                            (index, found, branch_stats,
+                             branch_reason) = results.next(POLL_PERIOD)
+                            break
+                        except multiprocessing.TimeoutError:
+                            # the time limit and cancellation of the
+                            # caller are checked while waiting
+                            if budget is not None:
+                                budget.check()
+                    stats['nodes'] += branch_stats['nodes']
+                    stats['backtracks'] += branch_stats['backtracks']
+                    stats['max_depth'] = max(stats['max_depth'],
+                                             branches[index][2] +
+                                             branch_stats['max_depth'])
+                    if budget is not None:
+                        budget.nodes += branch_stats['nodes']
+                    solutions.extend(found)
+                    reason = reason or branch_reason
+                    if limit is not None and len(solutions) >= limit:
+                        return (solutions[:limit], stats)
+                    if budget is not None and budget.node_budget is not None \
+                       and budget.nodes > budget.node_budget:
+                        budget._stop('node_budget')
+            finally:
+                # the workers still searching this grid give up
+                self._cancelled.value = generation
+        if reason is not None:
+            # some branch was not fully searched
+            budget._stop(reason)
+        return (solutions, stats)
+
+    def close(self):
+        """stop the worker processes"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+# pools used by `search_parallel` and `count_solutions_parallel`,
+# by number of workers
+_pools = {}
+
+
+def get_pool(workers=None):
+    """shared `SearchPool` of `workers` processes (default : number of
+    CPUs), created on first use and closed at exit"""
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers not in _pools:
+        if not _pools:
+            atexit.register(close_pools)
+        _pools[workers] = SearchPool(workers)
+    return _pools[workers]
+
+
+def close_pools():
+    """stop the worker processes of the shared pools"""
+    while _pools:
+        _pools.popitem()[1].close()
+
+
+def search_parallel(sudoku, workers=None):
+    """solve `sudoku` like `Sudoku.search`, with a shared pool of `workers`
+    processes (see `SearchPool.search`)"""
+    return get_pool(workers).search(sudoku)
+
+
+def count_solutions_parallel(sudoku, limit=2, workers=None):
+    """count the solutions of `sudoku` like `Sudoku.count_solutions`,
+    with a shared pool of `workers` processes
+    (see `SearchPool.count_solutions`)"""
+    return get_pool(workers).count_solutions(sudoku, limit)
@@ -0,0 +1,391 @@
+#!/usr/bin/python
+# -*- coding: UTF-8 -*-
+"""
+Solving service
+===============
+
+Asynchronous front end of the solver, to be embedded in a network service::
+
+    result = await solve_async(grid, timeout=2., node_budget=10000)
+
+The grids are solved by a pool of worker processes (see `SolverService`) :
+ * the number of requests in flight is bounded, the other requests
+   waiting for their turn (this waiting time counts in their timeout)
+ * each request has a time and search node budget, checked cooperatively
+   inside the rules and the searches (see `sudoku_solver.SolveBudget`),
+   so that a pathological puzzle cannot pin a worker
+ * when the budget is exhausted, the partial result is returned :
+   the grid with the Cells solved by the rules
+
+Results are JSON-serializable dicts (see `solve_request`).
+
+Two local front ends are included, for offline load testing :
+ * JSON lines on stdin/stdout, one request per line, either a bare grid
+   or an object {"id": ..., "grid": ..., "timeout": ..., "node_budget": ...}.
+   The responses are written as they complete, with the "id" of their
+   request (by default its line number)::
+
+    $ python sudoku_service.py jsonl < requests.jsonl > responses.jsonl
+
+ * HTTP : POST /solve with a JSON request object, GET /info for the
+   service counters::
+
+    $ python sudoku_service.py http --port 8080
+    $ curl -d '{"grid": "<81 symbols>", "timeout": 2}' localhost:8080/solve
+"""
+
+from __future__ import division, print_function
+import asyncio
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sudoku_solver import Sudoku, SolveBudget
+
+# default time budget of a request (seconds)
+DEFAULT_TIMEOUT = 10.
+
+# statuses of the results (see `solve_request`)
+STATUSES = ('solved', 'unsolvable', 'invalid', 'timeout', 'node_budget')
+
+
+def solve_request(grid, timeout=None, node_budget=None, backend='rules',
+                  deadline=None):
+    """solve one grid given as a compact string (see `Sudoku.from_string`)
+    within a time and search node budget (see `SolveBudget`), the time
+    being limited by `timeout` (seconds, from the call) and/or by the
+    absolute `deadline` (a `time.monotonic` value, so that the time spent
+    waiting for a worker counts as well)
+
+    Returns a dict with
+     * 'status' : 'solved', 'unsolvable' (contradictory grid),
+       'invalid' (grid of wrong size), 'timeout' or 'node_budget'
+     * 'grid' : compact string of the solution, or of the partial result
+       if the budget is exhausted (None if 'invalid')
+     * 'nb_solved' : number of solved Cells in 'grid'
+     * 'nodes' : number of search nodes
+     * 'elapsed' : solving time (seconds)
+     * 'error' : error message ('invalid' and 'unsolvable' only)
+    """
+    start = time.perf_counter()
+    try:
+        S = Sudoku.from_string(grid)
+    except ValueError as e:
+        return {'status': 'invalid', 'grid': None, 'nb_solved': 0,
+                'nodes': 0, 'elapsed': 0., 'error': str(e)}
+    budget = SolveBudget(timeout, node_budget, deadline=deadline)
+    (is_solved, nb_iter) = S.solve_game(search=True, backend=backend,
+                                        budget=budget)
+    if is_solved:
+        status = 'solved'
+    elif budget.reason in ('timeout', 'node_budget'):
+        status = budget.reason
+    else:
+        status = 'unsolvable'
+    result = {'status': status, 'grid': S.to_string(),
+              'nb_solved': S.nb_solved(), 'nodes': budget.nodes,
+              'elapsed': time.perf_counter() - start}
+    if status == 'unsolvable':
+        result['error'] = 'No solution'
+    return result
+
+
+class SolverService(object):
+    """asynchronous solving service backed by a pool of worker processes
+
+    Requests beyond `max_in_flight` wait for a free slot, which is only
+    freed when the worker is done with the request (even if its result
+    came too late). The pool is created on the first request and shut
+    down by `close` (or when leaving an `async with` block).
+    """
+
+    def __init__(self, workers=None, max_in_flight=None,
+                 timeout=DEFAULT_TIMEOUT, node_budget=None, backend='rules',
+                 grace=1.):
+        """workers : number of worker processes (default : number of CPUs)
+        max_in_flight : maximum number of requests sent to the workers at
+                        once (default : 2 per worker)
+        timeout, node_budget : default budget of the requests
+                               (see `solve`)
+        backend : solver backend (see `Sudoku.solve_game`)
+        grace : extra time (seconds) granted to a worker to report its
+                partial result after the timeout, before giving up on it
+        """
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self.workers = workers
+        self.max_in_flight = max_in_flight or 2*workers
+        self.timeout = timeout
+        self.node_budget = node_budget
+        self.backend = backend
+        self.grace = grace
+        self._executor = None
+        self._slots = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.counts = dict.fromkeys(STATUSES, 0)
+
+    async def solve(self, grid, timeout=None, node_budget=None):
+        """solve the compact `grid` in a worker process
+        (see `solve_request` for the result)
+
+        timeout : time budget (seconds), from the call to the result
+                  (default : the one of the service)
+        node_budget : maximum number of search nodes
+                      (default : the one of the service)
+        """
+        if timeout is None:
+            timeout = self.timeout
+        if node_budget is None:
+            node_budget = self.node_budget
+        # (the monotonic clock is shared with the worker processes)
+        deadline = time.monotonic() + timeout
+        self._start()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            return self._count(self._timeout_result(grid, timeout))
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self._executor, solve_request, grid, None, node_budget,
+                self.backend, deadline)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        remaining = max(deadline - time.monotonic(), 0.)
+        try:
+            # (shielded : the slot stays taken until the worker is done)
+            result = await asyncio.wait_for(asyncio.shield(future),
+                                            remaining + self.grace)
+        except asyncio.TimeoutError:
+            # the worker missed its deadline : give up on its result
+            result = self._timeout_result(grid, timeout)
+        return self._count(result)
+
+    def _start(self):
+        """create the worker pool, if not done yet"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers)
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+
+    async def start(self):
+        """start the worker processes now rather than on the first request
+        (e.g. before accepting connections, which the forked workers would
+        otherwise inherit)"""
+        self._start()
+        await asyncio.get_running_loop().run_in_executor(self._executor, int)
+
+    def _release(self, future=None):
+        """free the slot of a request (done callback of its `future`)"""
+        self.in_flight -= 1
+        self._slots.release()
+        if future is not None and not future.cancelled():
+            # (retrieved, for the results which were given up)
+            future.exception()
+
+    def _timeout_result(self, grid, timeout):
+        """result of a request which got no answer in time"""
+        return {'status': 'timeout', 'grid': grid, 'nb_solved': None,
+                'nodes': None, 'elapsed': timeout}
+
+    def _count(self, result):
+        self.counts[result['status']] += 1
+        return result
+
+    def info(self):
+        """dict of the service counters"""
+        return {'workers': self.workers, 'max_in_flight': self.max_in_flight,
+                'in_flight': self.in_flight, 'waiting': self.waiting,
+                'counts': dict(self.counts)}
+
+    def close(self, wait=False):
+        """shut the worker pool down, waiting for the requests being solved
+        if `wait` is True (the pending ones are cancelled)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+# service used by `solve_async`, created on first use
+_default_service = None
+
+
+async def solve_async(grid, timeout=DEFAULT_TIMEOUT, node_budget=None):
+    """solve the compact `grid` with a shared `SolverService`
+    (see `SolverService.solve`)"""
+    global _default_service
+    if _default_service is None:
+        _default_service = SolverService()
+    return await _default_service.solve(grid, timeout, node_budget)
+
+
+def _parse_request(text, default_id):
+    """(id, grid, timeout, node_budget) of a JSON request object,
+    or of a bare grid. Raises ValueError for a malformed object."""
+    text = text.strip()
+    if not text.startswith('{'):
+        return (default_id, text, None, None)
+    request = json.loads(text)
+    if not isinstance(request, dict) or \
+       not isinstance(request.get('grid'), str):
+        raise ValueError('Request without a "grid" string')
+    for key in ('timeout', 'node_budget'):
+        value = request.get(key)
+        # (bool is a subclass of int)
+        if value is not None and (isinstance(value, bool) or
+                                  not isinstance(value, (int, float)) or
+                                  not value >= 0):
+            raise ValueError('"%s" should be a non-negative number' % key)
+    return (request.get('id', default_id), request['grid'],
+            request.get('timeout'), request.get('node_budget'))
+
+
+async def _answer(service, text, default_id):
+    """response to the request `text` (see `_parse_request`)"""
+    try:
+        (request_id, grid, timeout, node_budget) = _parse_request(
+            text, default_id)
+    except ValueError as e:
+        # (counted like the grids rejected by `solve_request`)
+        request_id = default_id
+        result = service._count({'status': 'invalid', 'error': str(e)})
+    else:
+        result = await service.solve(grid, timeout, node_budget)
+    if request_id is not None:
+        result['id'] = request_id
+    return result
+
+
+async def serve_jsonlines(service, infile=None, outfile=None):
+    """answer the requests read from `infile` (default : standard input),
+    one per line, writing the responses to `outfile` (default : standard
+    output) as they complete. At most 2 * `service.max_in_flight` requests
+    are read ahead."""
+    infile = infile or sys.stdin
+    outfile = outfile or sys.stdout
+    loop = asyncio.get_running_loop()
+    pending = asyncio.Semaphore(2*service.max_in_flight)
+    tasks = set()
+
+    async def handle(text, line_number):
+        try:
+            response = await _answer(service, text, line_number)
+            outfile.write(json.dumps(response) + '\n')
+            outfile.flush()
+        finally:
+            pending.release()
+
+    line_number = 0
+    while True:
+        # blocking reads are left to a thread
+        line = await loop.run_in_executor(None, infile.readline)
+        if not line:
+            break
+        line_number += 1
+        if not line.strip() or line.startswith('#'):
+            continue
+        await pending.acquire()
+        task = asyncio.ensure_future(handle(line, line_number))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def _http_handler(service, reader, writer):
+    """answer one HTTP/1.0 style request (the connection is then closed)"""
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            (name, _, value) = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            length = None
+        if len(request_line) < 2 or length is None or length < 0:
+            (code, response) = (400, {'error': 'Bad request'})
+        elif request_line[:2] == ['POST', '/solve']:
+            body = await reader.readexactly(length)
+            # (a body which is not UTF-8 is answered as an invalid request)
+            response = await _answer(service, body.decode('utf-8', 'replace'),
+                                     None)
+            code = 400 if response['status'] == 'invalid' else 200
+        elif request_line[:2] == ['GET', '/info']:
+            (code, response) = (200, service.info())
+        else:
+            (code, response) = (404, {'error': 'Not found'})
+        payload = json.dumps(response).encode('utf-8')
+        writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json\r\n'
+                      'Content-Length: %d\r\nConnection: close\r\n\r\n' %
+                      (code, {200: 'OK', 400: 'Bad Request',
+                              404: 'Not Found'}[code], len(payload))
+                      ).encode('latin-1') + payload)
+        await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_http(service, host='127.0.0.1', port=8080):
+    """serve the solving requests over HTTP until cancelled
+    (see the module documentation)"""
+    await service.start()
+    server = await asyncio.start_server(
+        lambda reader, writer: _http_handler(service, reader, writer),
+        host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Sudoku solving service, answering JSON requests '
+                    'on stdin/stdout ("jsonl") or over HTTP ("http")')
+    parser.add_argument('mode', choices=['jsonl', 'http'])
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='number of worker processes (default: CPUs)')
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help='requests solved at once (default: 2/worker)')
+    parser.add_argument('-t', '--timeout', type=float,
+                        default=DEFAULT_TIMEOUT,
+                        help='default time budget of a request (seconds)')
+    parser.add_argument('--node-budget', type=int, default=None,
+                        help='default search node budget of a request')
+    parser.add_argument('--backend', default='rules', choices=['rules', 'dlx'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    service = SolverService(args.workers, args.max_in_flight, args.timeout,
+                            args.node_budget, args.backend)
+    try:
+        if args.mode == 'jsonl':
+            asyncio.run(serve_jsonlines(service))
+        else:
+            asyncio.run(serve_http(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # (the pool threads are left in a clean state for the exit)
+        service.close(wait=True)
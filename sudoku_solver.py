@@ -13,34 +13,307 @@ see README.rst for more information
 
 from __future__ import division, print_function
 import os.path
+import sys
+import time
+from array import array
+from collections import deque, namedtuple
 
-try:
-    from termcolor import colored
-except ImportError:
-    print('Warning: termcolor module is needed to add some fancyness!')
-    def colored(text, color=None, on_color=None, attrs=None):
-        '''dummy colored function'''
-        return text
+# Candidate bitmasks :
+# the possibilities of a cell are stored as an integer mask,
+# digit d being present if bit (d-1) is set (9 bits for a 9x9 grid).
+_FULL_MASK = (1 << 9) - 1 # = 0b111111111, all digits possible
+# Lookup tables indexed by 9-bit mask (see `_mask_tables` for wider masks),
+# built bit by bit : the masks with bit k set follow the masks below 2**k,
+# in the same order (cheaper than testing the bits of each mask, which
+# matters for the import time) :
+# indices of the set bits of each mask
+_BIT_INDICES = [()]
+for _k in range(9):
+    _BIT_INDICES += [indices + (_k,) for indices in _BIT_INDICES]
+_BIT_INDICES = tuple(_BIT_INDICES)
+# set of possible digits
+_MASK_DIGITS = [frozenset()]
+for _k in range(9):
+    _MASK_DIGITS += [digits | {_k+1} for digits in _MASK_DIGITS]
+_MASK_DIGITS = tuple(_MASK_DIGITS)
+del _k
+# number of possibilities
+_POPCOUNT = bytearray(map(len, _BIT_INDICES))
+# lowest possible digit (0 for the empty mask)
+_LOWEST_DIGIT = bytearray([0]) + bytearray(indices[0] + 1
+                                           for indices in _BIT_INDICES[1:])
+
+# Symbols of the numbers 1, 2, ... in grid strings (up to 35 numbers),
+# "." (or "0") being an empty cell
+_SYMBOLS = '123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+class _LazyTable(dict):
+    """lookup table whose items are computed on first access
+    by `function(key)` (for the masks too wide to be tabulated).
+    At most `maxsize` items are kept, the oldest ones being dropped,
+    so that the table does not grow with the number of grids solved."""
+    __slots__ = ('function', 'maxsize')
+    
+    def __init__(self, function, maxsize=4096):
+        self.function = function
+        self.maxsize = maxsize
+    
+    def __missing__(self, key):
+        if len(self) >= self.maxsize:
+            del self[next(iter(self))]
+        value = self[key] = self.function(key)
+        return value
+
+class _PopcountTable(object):
+    """popcount "table" of the masks too wide to be tabulated,
+    computed on each access"""
+    __slots__ = ()
+    __getitem__ = staticmethod(getattr(int, 'bit_count', None) or
+                               (lambda m: bin(m).count('1')))
+
+class _LowestDigitTable(object):
+    """lowest digit "table" of the masks too wide to be tabulated,
+    computed on each access"""
+    __slots__ = ()
+    __getitem__ = staticmethod(lambda m: (m & -m).bit_length())
+
+# Subset sizes looked for by the Sudoku rules (pairs, triples, quads) :
+_MAX_SUBSET = 4
+
+# Inference rules working across the Cell sets (see `Sudoku.apply_rules`),
+# in order of cost :
+#  * 'intersections' : pointing and claiming (see `Sudoku.apply_intersections`)
+#  * 'x-wing', 'swordfish' : fish patterns (see `Sudoku.apply_fish`)
+RULES = ('intersections', 'x-wing', 'swordfish')
+# rules used by default : the fish patterns rarely save enough search
+# nodes to pay for their cost on the benchmark corpora
+DEFAULT_RULES = ('intersections',)
+
+# mask tables of each number of numbers (see `_mask_tables`)
+_tables_cache = {}
+
+# lookup tables of the candidate masks of a grid (see `_mask_tables`)
+_MaskTables = namedtuple('_MaskTables', ['nb_numbers', 'full_mask', 'popcount',
+                                         'lowest_digit', 'mask_digits',
+                                         'bit_indices'])
+
+def _mask_tables(nb_numbers):
+    """lookup tables of the candidate masks of a grid with `nb_numbers`
+    numbers (see `_MaskTables`), each table being indexed by mask.
+    Masks of up to 9 bits use the precomputed tables. For wider masks,
+    the popcount and lowest digit are computed on each access, and the
+    digit sets and bit indices are kept in bounded tables filled on demand.
+    """
+    if nb_numbers not in _tables_cache:
+        if nb_numbers > len(_SYMBOLS):
+            raise ValueError('Grids of more than %d numbers are not supported'
+                             % len(_SYMBOLS))
+        if nb_numbers <= 9:
+            tables = (_POPCOUNT, _LOWEST_DIGIT, _MASK_DIGITS, _BIT_INDICES)
+        else:
+            digits = range(nb_numbers)
+            tables = (
+                _PopcountTable(),
+                _LowestDigitTable(),
+                _LazyTable(lambda m: frozenset(k+1 for k in digits
+                                               if m >> k & 1)),
+                _LazyTable(lambda m: tuple(k for k in digits if m >> k & 1)))
+        _tables_cache[nb_numbers] = _MaskTables(nb_numbers,
+                                                (1 << nb_numbers) - 1, *tables)
+    return _tables_cache[nb_numbers]
+
+def _mask_typecode(nb_numbers):
+    """array typecode of the candidate masks of `nb_numbers` numbers"""
+    if nb_numbers <= 16:
+        return 'H'
+    elif nb_numbers <= 32:
+        return 'L'
+    else:
+        return 'Q'
+
+def _digits_to_mask(digits):
+    """bitmask of an iterable of digits"""
+    mask = 0
+    for d in digits:
+        mask |= 1 << (d-1)
+    return mask
+
+# progress messages of quiet Sudoku instances go to this logger
+# (see `Sudoku._report` : `logging` is not imported by the solver)
+LOGGER_NAME = 'sudoku_solver'
+
+class Contradiction(ValueError):
+    """raised by the rules when the grid state is inconsistent : a Cell
+    without any possibility, a number solved twice in a Cell set...
+    (a dead end for the searches)"""
+
+def _subsets(items, max_subset, popcount):
+    """find the groups of 2 to `max_subset` items (mask, bit) whose masks
+    hold, all together, at most as many bits as there are items.
+    
+    The combinations of items are enumerated depth-first, a branch being
+    abandoned as soon as the union of its masks gets more than
+    `max_subset` bits, so that large Cell sets (16x16, 25x25 grids)
+    remain cheap.
+    
+    Returns a list of (size, union of the masks, union of the bits),
+    sorted by size
+    """
+    found = []
+    nb_items = len(items)
+    # partial groups : (next item, size, union of masks, union of bits)
+    stack = [(0, 0, 0, 0)]
+    while stack:
+        (start, size, union, bits) = stack.pop()
+        for j in range(start, nb_items):
+            (m, bit) = items[j]
+            u = union | m
+            count = popcount[u]
+            if count > max_subset:
+                continue
+            b = bits | bit
+            if size and count <= size + 1:
+                found.append((size + 1, u, b))
+            if size + 1 < max_subset and j + 1 < nb_items:
+                stack.append((j + 1, size + 1, u, b))
+    found.sort(key=lambda group: group[0])
+    return found
+
+def _naked_subsets(unit_masks, max_subset=_MAX_SUBSET, popcount=_POPCOUNT):
+    """find the naked subsets of a Cell set, given the list of the masks
+    of its cells : groups of k cells (k = 1 to `max_subset`) holding,
+    all together, exactly k possibilities, which are then excluded from
+    the other cells.
+    `popcount` is the popcount table of the masks (see `_mask_tables`)
+    
+    Returns a list of (digits mask, places mask) pairs, the places mask
+    being the bitmask of the positions of the group cells in `unit_masks`
+    
+    Raises Contradiction if k cells hold less than k possibilities
+    """
+    groups = []
+    unsolved = []
+    for k, m in enumerate(unit_masks):
+        count = popcount[m]
+        if count == 1:
+            # fully solved cell
+            groups.append((m, 1 << k))
+        elif count <= max_subset:
+            unsolved.append((m, 1 << k))
+    if len(unsolved) >= 2:
+        for (size, digits, places) in _subsets(unsolved, max_subset, popcount):
+            count = popcount[digits]
+            if count == size:
+                groups.append((digits, places))
+            else:
+                raise Contradiction('%d cells share only %d possibilities'
+                                    % (size, count))
+    return groups
+
+def _hidden_subsets(unit_masks, max_subset=_MAX_SUBSET, popcount=_POPCOUNT,
+                    bit_indices=_BIT_INDICES):
+    """find the hidden subsets of a Cell set, given the list of the masks
+    of its cells : groups of k numbers (k = 1 to `max_subset`) which can only
+    be placed, all together, in exactly k cells, which must then hold
+    these numbers.
+    Numbers already placed in a solved cell are skipped.
+    `popcount` and `bit_indices` are tables of the masks (see `_mask_tables`)
+    
+    Returns a list of (digits mask, places mask) pairs (see `_naked_subsets`)
+    
+    Raises Contradiction if k numbers can be placed in less than k cells
+    """
+    placements = []
+    candidates = []
+    for d in range(len(unit_masks)):
+        bit = 1 << d
+        places = 0
+        for k, m in enumerate(unit_masks):
+            if m & bit:
+                places |= 1 << k
+        count = popcount[places]
+        if count == 0:
+            raise Contradiction('Number %d cannot be placed' % (d+1))
+        elif count == 1:
+            if unit_masks[bit_indices[places][0]] != bit:
+                # hidden single
+                placements.append((bit, places))
+        elif count <= max_subset:
+            candidates.append((places, bit))
+    if len(candidates) >= 2:
+        for (size, places, digits) in _subsets(candidates, max_subset,
+                                               popcount):
+            count = popcount[places]
+            if count == size:
+                placements.append((digits, places))
+            else:
+                raise Contradiction('%d numbers can only be placed in %d '
+                                    'cells' % (size, count))
+    return placements
 
 class Cell(object):
-    """represents a Sudoku cell"""
+    """represents a Sudoku cell
     
-    # all available possibilities in a the cell :
+    A Cell is a thin view over one item of a candidate mask buffer
+    (an `array`, typically `Sudoku.masks`), so that the whole grid
+    state lives in one flat buffer.
+    When the Cell belongs to a Sudoku (its `owner`), the owner is notified
+    of each strict decrease of the possibilities.
+    """
+    __slots__ = ('pos', 'index', '_masks', '_owner', '_tables')
+    # all available possibilities of a 9x9 grid
+    # (see `all_numbers` for the Cells of any grid size)
     all_possibilities = set(range(1,10)) # = {1:9}
     
-    def __init__(self, pos, solution = None):
+    def __init__(self, pos, solution = None, masks = None, index = 0,
+                 owner = None):
         """pos = (a0,a1) is the cell position in the grid
         solution : [optional] sets the content of the cell
                    (creates a solved cell)
+        masks : [optional] candidate mask buffer the cell is a view on,
+                `index` being the position of the cell in the buffer.
+                If None, the cell gets its own buffer (all possibilities)
+        owner : [optional] Sudoku instance the cell belongs to,
+                which also sets the number of possibilities (9 otherwise)
         """
         assert len(pos) == 2
         self.pos = pos
-        self.possibilities = self.all_possibilities.copy()
+        self._tables = owner._tables if owner is not None else _mask_tables(9)
+        if masks is None:
+            masks = array(_mask_typecode(self._tables.nb_numbers),
+                          [self._tables.full_mask])
+            index = 0
+        self._masks = masks
+        self.index = index
+        self._owner = owner
         
         if solution is not None:
-            assert solution in self.all_possibilities
+            assert solution in self.all_numbers
             # keep only the solution
-            self.keep_possibilities(set([solution]))
+            self.keep_mask(1 << (solution-1))
+    
+    @property
+    def all_numbers(self):
+        """all available possibilities in the cell, for the size of its
+        grid : {1, ..., 9} for a 9x9 grid"""
+        return set(range(1, self._tables.nb_numbers+1))
+    
+    @property
+    def mask(self):
+        """bitmask of the possibilities of the cell"""
+        return self._masks[self.index]
+    
+    @property
+    def possibilities(self):
+        """(frozen) set of the possibilities of the cell"""
+        return self._tables.mask_digits[self._masks[self.index]]
+    
+    @possibilities.setter
+    def possibilities(self, digits):
+        mask = self._masks[self.index]
+        self._masks[self.index] = _digits_to_mask(digits)
+        if self._owner is not None and self._masks[self.index] != mask:
+            self._owner._cell_changed(self.index, mask)
     
     def remove_possibilities(self, rm_set):
         """remove a set of possibilities
@@ -52,15 +325,26 @@ class Cell(object):
         
         See also : keep_possibilities
         """
-        if self.possibilities.isdisjoint(rm_set):
+        return self.remove_mask(_digits_to_mask(rm_set))
+    # end remove_possibilities
+    
+    def remove_mask(self, rm_mask):
+        """same as `remove_possibilities`, with the possibilities
+        to remove given as a bitmask
+        """
+        mask = self._masks[self.index]
+        if not mask & rm_mask:
             return False
         else:
-            self.possibilities -= rm_set
-            if len(self.possibilities) < 1:
-                raise ValueError("Removing %s from Cell %s makes it empty!" %
-                (rm_set, self.pos))
+            if not mask & ~rm_mask:
+                tables = self._tables
+                digits = set(tables.mask_digits[rm_mask & tables.full_mask])
+                raise Contradiction("Removing %s from Cell %s makes it empty!" %
+                                    (digits, self.pos))
+            self._masks[self.index] = mask & ~rm_mask
+            if self._owner is not None:
+                self._owner._cell_changed(self.index, mask)
             return True
-    # end remove_possibilities
     
     def keep_possibilities(self, kp_set):
         """ keep only a given set of possibilities `kp_set`
@@ -68,7 +352,7 @@ class Cell(object):
         1. previously available possibilities
         2. `kp_set`
         
-        (ValueError is raised if the intersection is empty)
+        (Contradiction is raised if the intersection is empty)
         
         - returns True if there was strict decrease in
         the size of possibilities set
@@ -77,101 +361,546 @@ class Cell(object):
         
         See also : remove_possibilities
         """
+        return self.keep_mask(_digits_to_mask(kp_set))
+    # end keep_possibilities
+    
+    def keep_mask(self, kp_mask):
+        """same as `keep_possibilities`, with the possibilities
+        to keep given as a bitmask
+        """
+        mask = self._masks[self.index]
         # 1) Check for empty intersection:
-        if self.possibilities.isdisjoint(kp_set):
-            raise ValueError("Keeping only %s from Cell %s makes it empty!" %
-                (kp_set, self.pos))
+        if not mask & kp_mask:
+            tables = self._tables
+            digits = set(tables.mask_digits[kp_mask & tables.full_mask])
+            raise Contradiction("Keeping only %s from Cell %s makes it empty!" %
+                                (digits, self.pos))
         # 2) Do the job:
-        if self.possibilities.issubset(kp_set):
+        if mask & kp_mask == mask:
             # nothing to do
             return False
         else:
             # Strict decrease in the number of available possibilities
-            self.possibilities.intersection_update(kp_set)
+            self._masks[self.index] = mask & kp_mask
+            if self._owner is not None:
+                self._owner._cell_changed(self.index, mask)
             return True
-    # end keep_possibilities
     
     def is_solved(self):
         """is the cell in a solved state, that is
         there is just one possibility"""
-        return len(self.possibilities) == 1
+        return self._tables.popcount[self._masks[self.index]] == 1
     
     def solution(self):
         """returns the cell solution, if available
         else returns None"""
-        if self.is_solved():
-            return tuple(self.possibilities)[0]
+        mask = self._masks[self.index]
+        if self._tables.popcount[mask] == 1:
+            return self._tables.lowest_digit[mask]
         else:
             return None
     
     def __str__(self):
-        """string of the solution, or "." if Cell is unsolved"""
+        """symbol of the solution (see `_SYMBOLS`),
+        or "." if Cell is unsolved"""
         sol = self.solution()
         if sol is None:
             return "."
         else:
-            return str(sol)
+            return _SYMBOLS[sol-1]
     
     def __repr__(self):
         sol = self.solution()
         if sol is None:
             return 'Cell((%d,%d))' % self.pos
         else:
-            return 'Cell((%d,%d), %s)' % (self.pos + (str(sol),))
-        
+            return 'Cell((%d,%d), %d)' % (self.pos + (sol,))
+
+def _build_index(grid_size, block_size):
+    """build the static unit/peer index of a grid of size `grid_size`
+    divided in blocks of size `block_size`.
+    
+    Cells are numbered in row-major order (index = a0*N1 + a1).
+    Returns a tuple (units, cell_units, peers) with
+     * units : tuple of the cell indices of each set number n
+               (see Sudoku.get_set for the numbering)
+     * cell_units : for each cell, the 3 set numbers containing it
+     * peers : for each cell, the indices of the cells sharing
+               at least one set with it (20 peers for a 9x9 grid)
+    """
+    (N0, N1) = grid_size
+    (B0, B1) = block_size
+    rows = [tuple(a0*N1 + a1 for a1 in range(N1)) for a0 in range(N0)]
+    cols = [tuple(a0*N1 + a1 for a0 in range(N0)) for a1 in range(N1)]
+    blocks = []
+    for block_number in range((N0//B0)*(N1//B1)):
+        (A0, A1) = (block_number % (N0//B0), block_number // (N0//B0))
+        blocks.append(tuple(a0*N1 + a1
+                            for a0 in range(A0*B0, (A0+1)*B0)
+                            for a1 in range(A1*B1, (A1+1)*B1)))
+    units = tuple(rows + cols + blocks)
+    
+    cell_units = [[] for i in range(N0*N1)]
+    for n, unit in enumerate(units):
+        for i in unit:
+            cell_units[i].append(n)
+    cell_units = tuple(tuple(u) for u in cell_units)
+    
+    peers = tuple(tuple(sorted(set(j for n in cell_units[i]
+                                     for j in units[n]) - set([i])))
+                  for i in range(N0*N1))
+    return (units, cell_units, peers)
+
+# index cache, shared by all Sudoku instances of the same geometry
+_index_cache = {}
+
+def _build_intersections(units, nb_numbers):
+    """build the intersections of each block with the rows and the columns
+    (see `_build_index` for `units`).
+    
+    Returns (segments, intersections) with
+     * segments : tuple of the cell indices of each non-empty intersection
+       of a block with a line
+     * intersections : for each segment, a tuple (segment number,
+       the other segments of the block along the same direction,
+       the other segments of the line, the cells of the rest of the block,
+       the cells of the rest of the line)
+    """
+    blocks = units[2*nb_numbers:]
+    lines = units[:2*nb_numbers]
+    segments = []
+    # (block number, line number) of each segment
+    owners = []
+    for b, block in enumerate(blocks):
+        for l, line in enumerate(lines):
+            segment = tuple(i for i in block if i in line)
+            if segment:
+                segments.append(segment)
+                owners.append((b, l))
+    intersections = []
+    for s, (b, l) in enumerate(owners):
+        # the segments of the same direction (rows : l < nb_numbers)
+        # fill the rest of the block
+        same_block = tuple(t for t, (b2, l2) in enumerate(owners)
+                           if b2 == b and t != s and
+                           (l2 < nb_numbers) == (l < nb_numbers))
+        same_line = tuple(t for t, (b2, l2) in enumerate(owners)
+                          if l2 == l and t != s)
+        intersections.append((
+            s, same_block, same_line,
+            tuple(i for t in same_block for i in segments[t]),
+            tuple(i for t in same_line for i in segments[t])))
+    return (tuple(segments), tuple(intersections))
+
+# intersections cache (see `_build_intersections`), by geometry
+_intersections_cache = {}
+
+class SolverStats(object):
+    """opt-in statistics collector of the solving process
+    (see `Sudoku.solve_game`)
+    
+    For each rule ("injectivity", "surjectivity") and each type of
+    Cell set (row, column, block), it records the number of calls,
+    the wall time, the number of solved groups found and the number of
+    possibilities eliminated. It also counts the iterations and the
+    Cells which got some progress.
+    """
+    set_types = ('row', 'column', 'block')
+    
+    def __init__(self, callback=None):
+        """callback : [optional] function called as `callback(sudoku, stats)`
+                   at the end of each iteration of `Sudoku.solve_game`
+        """
+        self.callback = callback
+        # (rule, set type) -> [calls, time, groups, eliminations]
+        self.rules = {}
+        self.iterations = 0
+        self.cell_changes = 0
+        self.total_time = 0.
+        self.search = None
+    
+    def record(self, rule, set_type, seconds, nb_groups, nb_eliminated):
+        """record one application of `rule` to a Cell set of type `set_type`"""
+        entry = self.rules.get((rule, set_type))
+        if entry is None:
+            entry = self.rules[(rule, set_type)] = [0, 0., 0, 0]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += nb_groups
+        entry[3] += nb_eliminated
+    
+    def end_iteration(self, sudoku):
+        """record the end of an iteration of the solving loop"""
+        self.iterations += 1
+        if self.callback is not None:
+            self.callback(sudoku, self)
+    
+    def report(self):
+        """structured report of the statistics, as a dict :
+        {'total_time', 'iterations', 'cell_changes', 'search',
+         'rules': {rule: {set type: {'calls', 'time', 'groups',
+                                     'eliminations'}}}}
+        """
+        rules = {}
+        for (rule, set_type), entry in self.rules.items():
+            rules.setdefault(rule, {})[set_type] = dict(zip(
+                ('calls', 'time', 'groups', 'eliminations'), entry))
+        return {'total_time': self.total_time,
+                'iterations': self.iterations,
+                'cell_changes': self.cell_changes,
+                'search': self.search,
+                'rules': rules}
+
+class BudgetExceeded(Exception):
+    """raised at the checkpoints of the solver when its `SolveBudget`
+    is exhausted (the reason is in `args[0]`)"""
+    
+class SolveBudget(object):
+    """opt-in time and search node limits of the solving process
+    (see `Sudoku.solve_game`)
+    
+    The limits are checked cooperatively : once for each Cell set processed
+    by the rules and once for each node of the searches, `BudgetExceeded`
+    being raised as soon as one of them is exhausted. The reason is then
+    available in `reason` : 'timeout', 'node_budget' or 'cancelled'.
+    """
+    
+    def __init__(self, timeout=None, node_budget=None, cancel=None,
+                 deadline=None):
+        """timeout : [optional] wall time limit (seconds), counted from
+                  the creation of the budget
+        node_budget : [optional] maximum number of search nodes
+        cancel : [optional] function returning True when the solving
+                 should be abandoned (like `threading.Event.is_set`)
+        deadline : [optional] absolute time limit, as a `time.monotonic`
+                   value (which can be passed to another process), the
+                   earliest of `timeout` and `deadline` being kept
+        """
+        self.timeout = timeout
+        self.node_budget = node_budget
+        self.cancel = cancel
+        if timeout is not None:
+            end = time.monotonic() + timeout
+            deadline = end if deadline is None else min(deadline, end)
+        self.deadline = deadline
+        self.nodes = 0
+        self.reason = None
+    
+    def check(self):
+        """cancellation checkpoint of the rules"""
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self._stop('timeout')
+        if self.cancel is not None and self.cancel():
+            self._stop('cancelled')
+    
+    def add_node(self):
+        """cancellation checkpoint of the searches, counting one node"""
+        self.nodes += 1
+        if self.node_budget is not None and self.nodes > self.node_budget:
+            self._stop('node_budget')
+        self.check()
+    
+    def _stop(self, reason):
+        self.reason = reason
+        raise BudgetExceeded(reason)
+    
 class Sudoku(object):
     """represent the Sudoku game"""
     # size of the Sudoku grid
     grid_size = (9,9)
     # size of the subblocks : 
     block_size = (3,3)
+    # inference rules working across the Cell sets, applied when the
+    # rules of `process_set` are stuck (see `apply_rules` and `RULES`)
+    rules = DEFAULT_RULES
+    # method of each named inference rule
+    _rule_methods = {'intersections': 'apply_intersections',
+                     'x-wing': 'apply_x_wing',
+                     'swordfish': 'apply_swordfish'}
     
-    def __init__(self, input_game=None):
+    def __init__(self, input_game=None, verbose=True, block_size=None):
         """input_game : filename of a file to load the game from
-                        if None, Sudoku starts completely unsolved"""
+                        if None, Sudoku starts completely unsolved
+        verbose : if True, progress messages are printed,
+                  otherwise they are only logged at INFO level
+                  (see `LOGGER_NAME`)
+        block_size : [optional] (B0, B1) size of the blocks, for a grid
+                     of B0*B1 x B0*B1 Cells holding the numbers 1 to B0*B1
+                     (default : the class attribute, (3,3))
+        
+        See also the `from_string`, `from_list` and `from_buffer`
+        constructors to create a game without file input
+        """
+        if block_size is not None:
+            (B0, B1) = block_size
+            self.block_size = (B0, B1)
+            self.grid_size = (B0*B1, B0*B1)
         (N0, N1) = self.grid_size
+        self.verbose = verbose
         
-        # 1) Read the input, if any
-        input_str = None
+        # 0) Fetch the unit/peer index and the mask tables (built only once)
+        geometry = (self.grid_size, self.block_size)
+        if geometry not in _index_cache:
+            _index_cache[geometry] = _build_index(*geometry)
+        (self.units, self.cell_units, self.peers) = _index_cache[geometry]
+        self._tables = _mask_tables(len(self.units[0]))
+        
+        # The possibilities of all the N0*N1 cells are stored
+        # as bitmasks in one flat buffer :
+        self.masks = array(_mask_typecode(self._tables.nb_numbers),
+                           [self._tables.full_mask]) * (N0*N1)
+        # Cell views over the buffer are created on first access
+        self._cells = None
+        # statistics of the last depth-first search (see `search`)
+        self.search_stats = None
+        # work queue of the Cell sets to process (see `propagate`)
+        self._queue = None
+        # opt-in statistics collector (see `SolverStats`)
+        self.stats = None
+        # statistics collector of the last `solve_game` call, if any
+        self.last_stats = None
+        # opt-in time and node limits (see `SolveBudget`)
+        self.budget = None
+        # undo log of (cell index, previous mask), recorded only while
+        # there are checkpoints (see `checkpoint` and `undo`)
+        self._trail = None
+        self._checkpoints = []
+        
+        # Read the input, if any
         if input_game is not None:
-            meaningful_chr = '123456789.'
+            meaningful_chr = _SYMBOLS[:self._tables.nb_numbers] + '.'
             self.sudoku_file=input_game
             with open(input_game) as f:
                 input_str = f.read()
             # filter out blanks and formatting characters
             input_str = [ch for ch in input_str
                             if ch in meaningful_chr]
-            if len(input_str) == N0*N1: # 81
-                print('Sudoku "%s" successfully loaded' %
-                       os.path.basename(self.sudoku_file))
+            if len(input_str) == N0*N1: # 81 for a 9x9 grid
+                self._report('Sudoku "%s" successfully loaded',
+                             os.path.basename(self.sudoku_file))
             else:
                 raise ValueError('Input game "%s" is of wrong size '
                        '(should contain %d meaninful symbols instead of %d)' %
                        (os.path.basename(self.sudoku_file),
                         N0*N1, len(input_str))
                        )
+            self._set_givens([_SYMBOLS.index(ch)+1 if ch != '.' else 0
+                              for ch in input_str])
         else:
             self.sudoku_file=''
-        # All the 9*9 cells are stored in a list :
-        self.cells = []
-        # Populate the list:
-        for a0 in range(N0):
-            for a1 in range(N1):
-                sol = None
-                if input_str is not None:
-                    sol = input_str[a0*N0+a1]
-                    try:
-                       sol = int(sol)
-                       #print('(%d,%d) = %d' % (a0, a1, sol))
-                    except ValueError:
-                        # sol is not a number. Just skip
-                        sol = None
-                cell = Cell((a0,a1), solution=sol)
-                self.cells.append(cell)
-        print(' number of solved cells at startup : %d/81' %
-                      len([c for c in self.cells if c.is_solved()]))
+        self._report(' number of solved cells at startup : %d/%d',
+                     self.nb_solved(), len(self.masks))
     # end __init__
     
+    @classmethod
+    def _guess_block_size(cls, nb_cells, block_size):
+        """block size of a grid of `nb_cells` Cells : `block_size` if given,
+        otherwise the default one of the class or square blocks
+        (n, n) for a grid of n**4 Cells"""
+        if block_size is not None:
+            return block_size
+        (N0, N1) = cls.grid_size
+        if nb_cells != N0*N1:
+            n = int(round(nb_cells ** 0.25))
+            if n > 1 and n**4 == nb_cells:
+                return (n, n)
+        return cls.block_size
+    
+    @classmethod
+    def from_string(cls, grid, verbose=False, block_size=None):
+        """creates a game from the string `grid`, either
+         * N*N symbols in row-major order (blanks being ignored) :
+           the symbols of `_SYMBOLS` are given numbers (digits from 1 to 9
+           in a 9x9 grid), any other symbol (like "." or "0") is an empty cell
+         * or the content of a grid file (see `Sudoku.__init__`)
+        
+        block_size : [optional] size of the blocks (see `Sudoku.__init__`),
+                     by default guessed from the number of symbols
+                     (81 : 9x9, 256 : 16x16, 625 : 25x25...)
+        """
+        symbols = ''.join(grid.split())
+        block_size = cls._guess_block_size(len(symbols), block_size)
+        nb_numbers = block_size[0]*block_size[1]
+        numbers = _SYMBOLS[:nb_numbers]
+        if len(symbols) != nb_numbers**2:
+            # filter out formatting characters
+            symbols = [ch for ch in symbols if ch in numbers + '0.']
+        if len(symbols) != nb_numbers**2:
+            raise ValueError('Input game is of wrong size (should contain '
+                             '%d meaninful symbols instead of %d)' %
+                             (nb_numbers**2, len(symbols)))
+        return cls._from_values([numbers.index(ch)+1 if ch in numbers else 0
+                                 for ch in symbols], verbose, block_size)
+    
+    @classmethod
+    def from_list(cls, values, verbose=False, block_size=None):
+        """creates a game from a list of N*N numbers in row-major order
+        or a list of N rows of N numbers (N = 9 for a 9x9 grid).
+        Empty cells are 0 or None.
+        
+        block_size : [optional] see `from_string`
+        """
+        if values and isinstance(values[0], (list, tuple)):
+            values = [v for row in values for v in row]
+        block_size = cls._guess_block_size(len(values), block_size)
+        return cls._from_values([v or 0 for v in values], verbose, block_size)
+    
+    @classmethod
+    def from_buffer(cls, buf, verbose=False, block_size=None):
+        """creates a game from a bytes-like object of N*N bytes in row-major
+        order, each byte being either a number (0 for an empty cell)
+        or an ASCII symbol (see `from_string`)
+        
+        block_size : [optional] see `from_string`
+        """
+        buf = memoryview(buf)
+        if buf.itemsize != 1:
+            buf = buf.cast('B')
+        block_size = cls._guess_block_size(len(buf), block_size)
+        numbers = _SYMBOLS[:block_size[0]*block_size[1]].encode('ascii')
+        return cls._from_values([b if b <= len(numbers) else
+                                 numbers.find(b) + 1
+                                 for b in buf], verbose, block_size)
+    
+    @classmethod
+    def _from_values(cls, values, verbose, block_size=None):
+        """creates a game from a list of N*N numbers (0 for empty cells)"""
+        sudoku = cls(verbose=False, block_size=block_size)
+        if len(values) != len(sudoku.masks):
+            raise ValueError('Input game is of wrong size '
+                             '(should contain %d cells instead of %d)' %
+                             (len(sudoku.masks), len(values)))
+        sudoku._set_givens(values)
+        sudoku.verbose = verbose
+        sudoku._report(' number of solved cells at startup : %d/%d',
+                       sudoku.nb_solved(), len(sudoku.masks))
+        return sudoku
+    
+    def _set_givens(self, values):
+        """populate the buffer from a sequence of N*N numbers
+        in row-major order (0 for empty cells)"""
+        masks = self.masks
+        nb_numbers = self._tables.nb_numbers
+        for i, sol in enumerate(values):
+            if sol:
+                if not 1 <= sol <= nb_numbers:
+                    raise ValueError('Invalid number %r for cell %d' %
+                                     (sol, i))
+                masks[i] = 1 << (sol-1)
+    
+    def _report(self, message, *args):
+        """print a progress message (formatted with `args` like
+        `logging.info` does), or log it if in quiet mode"""
+        if self.verbose:
+            if len(args) == 1 and isinstance(args[0], dict):
+                args = args[0]
+            print(message % args if args else message)
+        elif 'logging' in sys.modules:
+            # otherwise, the logging is not configured and
+            # the INFO messages would be dropped anyway
+            sys.modules['logging'].getLogger(LOGGER_NAME).info(message,
+                                                               *args)
+    
+    def nb_solved(self):
+        """number of solved cells"""
+        popcount = self._tables.popcount
+        return sum(1 for m in self.masks if popcount[m] == 1)
+    
+    @property
+    def cells(self):
+        """list of the grid Cells, in row-major order
+        (views over the `masks` buffer)"""
+        if self._cells is None:
+            (N0, N1) = self.grid_size
+            self._cells = [Cell((a0,a1), masks=self.masks, index=a0*N1+a1,
+                                owner=self)
+                           for a0 in range(N0) for a1 in range(N1)]
+        return self._cells
+    
+    def copy(self):
+        """returns an independent copy of the game
+        (the candidate buffer is copied in one go, the unit index is shared)
+        """
+        other = object.__new__(type(self))
+        other.__dict__.update(self.__dict__)
+        other.masks = self.masks[:]
+        other._cells = None
+        other._trail = None
+        other._checkpoints = []
+        return other
+    
+    def snapshot(self):
+        """compact immutable token of the current grid state
+        (the raw candidate buffer), to be given back to `restore`
+        """
+        return self.masks.tobytes()
+    
+    def restore(self, token):
+        """set the grid back to the state saved by `snapshot`.
+        The checkpoints (see `checkpoint`) are discarded.
+        """
+        masks = array(self.masks.typecode)
+        masks.frombytes(token)
+        if len(masks) != len(self.masks):
+            raise ValueError('Snapshot of wrong size (%d cells instead of %d)'
+                             % (len(masks), len(self.masks)))
+        self.masks[:] = masks
+        self._trail = None
+        self._checkpoints = []
+    
+    def checkpoint(self):
+        """start recording the changes of the Cells in an undo log,
+        so that the grid can be set back to its current state with `undo`.
+        Checkpoints can be nested.
+        
+        Returns the checkpoint number (1 for the outermost one)
+        """
+        if self._trail is None:
+            self._trail = []
+        self._checkpoints.append(len(self._trail))
+        return len(self._checkpoints)
+    
+    def undo(self, checkpoint=None):
+        """set the grid back to its state at `checkpoint`
+        (default : the last one), by rolling back only the Cells changed
+        since then. This checkpoint and the later ones are removed.
+        """
+        start = self._pop_checkpoints(checkpoint)
+        trail = self._trail
+        masks = self.masks
+        while len(trail) > start:
+            (i, mask) = trail.pop()
+            masks[i] = mask
+        if not self._checkpoints:
+            self._trail = None
+    
+    def commit(self, checkpoint=None):
+        """remove `checkpoint` (default : the last one) and the later ones,
+        keeping the changes made since then. The changes remain recorded
+        for the earlier checkpoints, if any.
+        """
+        self._pop_checkpoints(checkpoint)
+        if not self._checkpoints:
+            self._trail = None
+    
+    def _pop_checkpoints(self, checkpoint):
+        """remove `checkpoint` and the later ones,
+        returns the trail length at `checkpoint`"""
+        if checkpoint is None:
+            checkpoint = len(self._checkpoints)
+        if not 1 <= checkpoint <= len(self._checkpoints):
+            raise ValueError('No checkpoint %s to go back to' % checkpoint)
+        start = self._checkpoints[checkpoint-1]
+        del self._checkpoints[checkpoint-1:]
+        return start
+    
+    def _set_mask(self, i, mask):
+        """set the possibilities of Cell `i`, recording the change
+        in the undo log (but without notification)"""
+        if self._trail is not None:
+            self._trail.append((i, self.masks[i]))
+        self.masks[i] = mask
+    
     def get_cell(self, a0, a1):
         """get the cell at row `a0` and column a1
         (for interactive use only)
@@ -180,54 +909,47 @@ class Sudoku(object):
         assert 0 <= a0 < N0
         assert 0 <= a1 < N1
         
-        c_list = [c for c in self.cells 
-                  if (c.pos[0]==a0 and c.pos[1]==a1)]
-        
-        return c_list[0]
+        return self.cells[a0*N1 + a1]
     
     def get_row_set(self, a0):
         """get the list of cells at row a0"""
-        return [c for c in self.cells if c.pos[0]==a0]
+        return [self.cells[i] for i in self.units[a0]]
     
     def get_col_set(self, a1):
         """get the list of cells at column a1"""
-        return [c for c in self.cells if c.pos[1]==a1]
+        (N0, N1) = self.grid_size
+        return [self.cells[i] for i in self.units[N0 + a1]]
     
     def get_block_set(self, block_pos):
         """get the list of cell in the macro-block (A0,A1)"""
         assert len(block_pos) == 2
         (A0,A1) = block_pos
+        (N0, N1) = self.grid_size
+        (B0, B1) = self.block_size
         # print("macro block (%d,%d)" % block_pos)
-        return [c for c in self.cells if c.pos[0]//3==A0 and c.pos[1]//3==A1]
+        block_number = A0 + A1*(N0//B0)
+        return [self.cells[i] for i in self.units[N0 + N1 + block_number]]
     
     def get_set(self,n):
         '''get the list of cell corresponding to set number n.
         This is the generic function to return any type of cell set.
         
-        Cell sets are classified as follows :
+        Cell sets are classified as follows (for a 9x9 grid) :
          * n =  0 to  8  : corresponds to row 0 to 8
          * n =  9 to 17  : corresponds to column 0 to 8
          * n = 18 to 26  : corresponds to macro-block 0 to 8
+        and likewise for an NxN grid (rows, then columns, then blocks)
         '''
-        (N0, N1) = self.grid_size
-        set_type = n // N0
-        assert set_type in set([0,1,2])
-        
-        if set_type == 0:
-            # returns a row
-            return self.get_row_set(a0=n)
-        
-        if set_type == 1:
-            # returns a colum
-            return self.get_col_set(a1=n-N0)
-        
-        if set_type == 2:
-            # returns a macro block
-            block_number = n-N0-N1
-            block_pos = (block_number%3, block_number//3)
-            return self.get_block_set(block_pos)
+        return [self.cells[i] for i in self.units[n]]
     # end get_set
     
+    def get_peers(self, a0, a1):
+        """get the list of the cells sharing a row, a column or a block
+        with the cell at row `a0` and column `a1` (20 cells for a 9x9 grid)
+        """
+        (N0, N1) = self.grid_size
+        return [self.cells[i] for i in self.peers[a0*N1 + a1]]
+    
     def find_solved_groups(self, cell_list):
         """find solved groups in the list of cells `cell_list`
         Returns a list of tuple pairs defined the following way :
@@ -237,44 +959,19 @@ class Sudoku(object):
         Solved groups are composed either of 
           * one cell that contain one possibility.
             This cell is *fully solved*
-          * two/three/four cells that contain 
-            two/three/four identical possibilities.
+          * two/three/four cells that contain, all together,
+            only two/three/four possibilities (a *naked subset*).
             These cells are only *partially solved* but we know for sure that
             their possibilities can't be used in an cell *outside* the group.
+        
+        (see `_naked_subsets`)
         """
-        possibilities = [(c.possibilities, c) for c in cell_list
-                                              if len(c.possibilities) <= 4]
-        
-        solved_groups = []
-        for n_pos in range(1,5):
-            #print('Finding groups of length %d...' % n_pos)
-            groups_n = [] # TODO : remove the groups_n variable which is useless
-            pos_n = [(pi,ci) for (pi,ci) in possibilities
-                             if len(pi) == n_pos]
-            
-            # Special case of fully solved Cells:
-            if n_pos == 1:
-                groups_n = [ (pi,[ci]) for (pi,ci) in pos_n]
-                solved_groups.extend(groups_n)
-                continue
-            
-            # Partially solved Cell: (n_pos>1)
-            # simple draft search algorithm
-            for i in range(len(pos_n)//2):
-                pi,ci = pos_n[i]
-                group_i = [ci]
-                for j in range(i+1,len(pos_n)):
-                    pj,cj = pos_n[j]
-                    if pi==pj:
-                        #print('Cells %s and %s are twins!' % (ci.pos,cj.pos))
-                        group_i.append(cj)
-                if len(group_i) == n_pos:
-                    groups_n.append((pi,group_i))
-                    #print('Solved group of length %d:' % n_pos)
-                    #print((pi,group_i))
-            if len(groups_n)>0:
-                solved_groups.extend(groups_n)
-        return solved_groups
+        tables = self._tables
+        groups = _naked_subsets([c.mask for c in cell_list],
+                                popcount=tables.popcount)
+        return [(set(tables.mask_digits[digits]),
+                 [cell_list[k] for k in tables.bit_indices[places]])
+                for (digits, places) in groups]
     
     def find_solved_placements(self, cell_list):
         '''find where numbers must be placed due to the rule of surjectivity
@@ -282,42 +979,20 @@ class Sudoku(object):
         Returns a list of tuple pairs defined the following way :
          (set of numbers to be placed,
           set of Cells where to place those numbers)
+        
+        Solved placements are composed of one/two/three/four numbers
+        which can only be placed, all together, in as many cells
+        (a *hidden subset*, see `_hidden_subsets`)
         '''
-        solved_placements = []
-        # Find all possible placements
-        possible_placements = list((poss, set(cell for cell in cell_list
-                                                 if poss in cell.possibilities)) 
-                                    for poss in Cell.all_possibilities)
-        # Filter placements that are solved
-        for n_pos in range(1,5):
-            places_n = [ (poss, cells)
-                         for poss,cells in possible_placements
-                         if len(cells)==n_pos]
-            
-            # 1) Special case of fully solved placements:
-            if n_pos == 1:
-                solved_placements.extend([(set([poss]), cells) 
-                                          for poss,cells in places_n
-                                          if not tuple(cells)[0].is_solved() ])
-                continue
-            
-            # 2) Partially solved placements: (n_pos>1)
-            # Search for identical placement possibilities
-            for i in range(len(places_n)//2):
-                pi,cells_i = places_n[i]
-                poss_group_i = set([pi])
-                for j in range(i+1,len(places_n)):
-                    # look for identical cells
-                    pj,cells_j = places_n[j]
-                    if cells_i==cells_j:
-                        poss_group_i.add(pj)
-                if len(poss_group_i) == n_pos:
-                    # the group is of proper length
-                    solved_placements.append((poss_group_i, cells_i))
-                    
-        return solved_placements
-    
-    def process_set(self,n):
+        tables = self._tables
+        placements = _hidden_subsets([c.mask for c in cell_list],
+                                     popcount=tables.popcount,
+                                     bit_indices=tables.bit_indices)
+        return [(set(tables.mask_digits[digits]),
+                 set(cell_list[k] for k in tables.bit_indices[places]))
+                for (digits, places) in placements]
+    
+    def process_set(self, n, max_subset=_MAX_SUBSET):
         """Apply the Sudoku Rules to the Cell set `n`
         (see Sudoku.get_set(n))
         It enforces both :
@@ -326,41 +1001,102 @@ class Sudoku(object):
          * "Surjectivity" : enforce the placement of numbers which must be
            (with the help of `find_solved_placements` method)
         
-        Returns True if there was some progress in the elimination process
-                False otherwise
+        max_subset : largest size of the groups of Cells (numbers) looked for
+                     (1 for the singles only, up to 4 for quads)
+        
+        Returns the number of possibilities eliminated
+        (0 if there was no progress in the elimination process)
         """
-        cell_list = self.get_set(n)
+        unit = self.units[n]
+        unit_masks = [self.masks[i] for i in unit]
         # 1a) Find groups that are already solved:
-        solved_groups = self.find_solved_groups(cell_list)
+        if self.stats is not None:
+            return self._process_set_with_stats(n, unit, unit_masks,
+                                                max_subset)
+        tables = self._tables
+        solved_groups = _naked_subsets(unit_masks, max_subset,
+                                       tables.popcount)
         
         # 1b) Find placements that are already solved:
-        solved_placements = self.find_solved_placements(cell_list)
-        
-        nb_progress = 0
+        solved_placements = _hidden_subsets(unit_masks, max_subset,
+                                            tables.popcount,
+                                            tables.bit_indices)
         
         # 2a) Apply Injectivity Rule
-        for c in cell_list:
-            if c.is_solved() or not (solved_groups):
-                continue
-            
-            # Filter what are the wrong possibilities for cell `c`
-            wrong_poss = [poss_i
-                          for poss_i,group_i in solved_groups
-                          if not c in group_i]
-            
-            # merge the sets of wrong possibilities:
-            wrong_poss = wrong_poss[0].union(*wrong_poss[1:])
-            # Remove the wrong possibilities from cell `c` :
-            nb_progress += int(c.remove_possibilities(wrong_poss))
-            
+        nb_eliminated = self._apply_injectivity(unit, solved_groups)
         # 2b) Surjectivity Rule
-        # placement enforcement with c.keep_possibilities()
-        for poss_i,group_i in solved_placements:
-            for cell in group_i:
-                nb_progress += int(cell.keep_possibilities(poss_i))
+        nb_eliminated += self._apply_surjectivity(unit, solved_placements)
+        
+        #print('Number of possibilities eliminated : %d' % nb_eliminated)
+        return nb_eliminated
+    
+    def _process_set_with_stats(self, n, unit, unit_masks, max_subset):
+        """same as `process_set`, timing each rule for `self.stats`"""
+        clock = time.perf_counter
+        tables = self._tables
+        t0 = clock()
+        solved_groups = _naked_subsets(unit_masks, max_subset,
+                                       tables.popcount)
+        t1 = clock()
+        solved_placements = _hidden_subsets(unit_masks, max_subset,
+                                            tables.popcount,
+                                            tables.bit_indices)
+        t2 = clock()
+        nb_injectivity = self._apply_injectivity(unit, solved_groups)
+        t3 = clock()
+        nb_surjectivity = self._apply_surjectivity(unit, solved_placements)
+        t4 = clock()
+        set_type = SolverStats.set_types[n*len(SolverStats.set_types) //
+                                         len(self.units)]
+        self.stats.record('injectivity', set_type, (t1-t0) + (t3-t2),
+                          len(solved_groups), nb_injectivity)
+        self.stats.record('surjectivity', set_type, (t2-t1) + (t4-t3),
+                          len(solved_placements), nb_surjectivity)
+        return nb_injectivity + nb_surjectivity
+    
+    def _apply_injectivity(self, unit, solved_groups):
+        """remove the numbers of each solved group (digits mask, places mask)
+        from the cells of `unit` outside of the group
         
-        #print('Number of cells that got some progress : %d' % nb_progress)
-        return nb_progress > 0
+        Returns the number of possibilities eliminated
+        """
+        if not solved_groups:
+            return 0
+        masks = self.masks
+        cells = self.cells
+        popcount = self._tables.popcount
+        nb_eliminated = 0
+        for k, i in enumerate(unit):
+            # Merge the wrong possibilities for cell `i`:
+            wrong_poss = 0
+            for (digits, places) in solved_groups:
+                if not places >> k & 1:
+                    wrong_poss |= digits
+            wrong_poss &= masks[i]
+            if wrong_poss:
+                cells[i].remove_mask(wrong_poss)
+                nb_eliminated += popcount[wrong_poss]
+        return nb_eliminated
+    
+    def _apply_surjectivity(self, unit, solved_placements):
+        """keep only the numbers of each solved placement
+        (digits mask, places mask) in the cells of the placement
+        
+        Returns the number of possibilities eliminated
+        """
+        masks = self.masks
+        cells = self.cells
+        (popcount, bit_indices) = (self._tables.popcount,
+                                   self._tables.bit_indices)
+        nb_eliminated = 0
+        for (digits, places) in solved_placements:
+            for k in bit_indices[places]:
+                i = unit[k]
+                wrong_poss = masks[i] & ~digits
+                if wrong_poss:
+                    cells[i].keep_mask(digits)
+                    nb_eliminated += popcount[wrong_poss]
+        return nb_eliminated
     # end process_set
     
     def process_all_sets(self):
@@ -369,126 +1105,651 @@ class Sudoku(object):
         Returns True if there was some progress in the elimination process
                 False otherwise
         """
-        progress = False
-        for n in range(9+9+9):
-            progress |=  self.process_set(n)
-        return progress
+        nb_eliminated = 0
+        budget = self.budget
+        for n in range(len(self.units)):
+            if budget is not None:
+                budget.check()
+            nb_eliminated += self.process_set(n)
+        return nb_eliminated > 0
     # end process_all_sets
     
-    def solve_game(self, max_iter=20):
+    def apply_intersections(self):
+        """apply the "pointing" and "claiming" rules to the intersections
+        of each block with the rows and the columns :
+         * if the possible places of a number in a block all lie in one row
+           (column), it is removed from the rest of this row (column)
+         * if the possible places of a number in a row (column) all lie in
+           one block, it is removed from the rest of this block
+        
+        Returns the number of possibilities eliminated
+        """
+        geometry = (self.grid_size, self.block_size)
+        if geometry not in _intersections_cache:
+            _intersections_cache[geometry] = _build_intersections(
+                self.units, self._tables.nb_numbers)
+        (segments, intersections) = _intersections_cache[geometry]
+        masks = self.masks
+        cells = self.cells
+        popcount = self._tables.popcount
+        # union of the possibilities of each segment
+        segment_masks = []
+        for segment in segments:
+            mask = 0
+            for i in segment:
+                mask |= masks[i]
+            segment_masks.append(mask)
+        nb_eliminated = 0
+        for (s, same_block, same_line,
+             block_rest, line_rest) in intersections:
+            block_mask = 0
+            for t in same_block:
+                block_mask |= segment_masks[t]
+            line_mask = 0
+            for t in same_line:
+                line_mask |= segment_masks[t]
+            inter_mask = segment_masks[s]
+            # numbers confined to the intersection within the block
+            # (pointing) or within the line (claiming) :
+            for (confined, rest) in ((inter_mask & ~block_mask & line_mask,
+                                      line_rest),
+                                     (inter_mask & ~line_mask & block_mask,
+                                      block_rest)):
+                if confined:
+                    for i in rest:
+                        wrong_poss = masks[i] & confined
+                        if wrong_poss:
+                            cells[i].remove_mask(wrong_poss)
+                            nb_eliminated += popcount[wrong_poss]
+                    # (the segment masks are not updated : being too large
+                    # only weakens the following tests)
+        return nb_eliminated
+    
+    def apply_fish(self, size):
+        """apply the "fish" rule with up to `size` lines (2 : X-Wing,
+        3 : Swordfish) : if the possible places of a number in k rows
+        all lie, together, in k columns, the number is removed from
+        the other rows of these columns (and likewise with the rows and
+        the columns swapped)
+        
+        Returns the number of possibilities eliminated
+        
+        Raises Contradiction if k rows can hold a number in less than k columns
+        """
+        masks = self.masks
+        cells = self.cells
+        (nb_numbers, full_mask, popcount, lowest_digit,
+         mask_digits, bit_indices) = self._tables
+        # row_places[k][a0] : bitmask of the columns of row a0 where
+        # number k+1 is possible, and col_places[k][a1] conversely
+        row_places = [[0]*nb_numbers for k in range(nb_numbers)]
+        col_places = [[0]*nb_numbers for k in range(nb_numbers)]
+        for i, m in enumerate(masks):
+            (a0, a1) = divmod(i, nb_numbers)
+            for k in bit_indices[m]:
+                row_places[k][a0] |= 1 << a1
+                col_places[k][a1] |= 1 << a0
+        nb_eliminated = 0
+        for k in range(nb_numbers):
+            bit = 1 << k
+            for (places, rows) in ((row_places[k], True),
+                                   (col_places[k], False)):
+                lines = [(p, 1 << a) for a, p in enumerate(places)
+                         if 1 < popcount[p] <= size]
+                if len(lines) < 2:
+                    continue
+                for (nb_lines, cover, base) in _subsets(lines, size,
+                                                        popcount):
+                    if popcount[cover] < nb_lines:
+                        raise Contradiction('Number %d fits in %d lines only '
+                                            'for %d lines' %
+                                            (k+1, popcount[cover], nb_lines))
+                    for b in bit_indices[cover]:
+                        for a in range(nb_numbers):
+                            if base >> a & 1:
+                                continue
+                            i = a*nb_numbers + b if rows else b*nb_numbers + a
+                            if masks[i] & bit:
+                                cells[i].remove_mask(bit)
+                                nb_eliminated += 1
+        return nb_eliminated
+    
+    def apply_x_wing(self):
+        """apply the X-Wing rule (see `apply_fish`)"""
+        return self.apply_fish(2)
+    
+    def apply_swordfish(self):
+        """apply the Swordfish rule, as well as X-Wing (see `apply_fish`)"""
+        return self.apply_fish(3)
+    
+    def apply_rules(self, units=None, max_subset=_MAX_SUBSET):
+        """apply all the Sudoku rules until there is no more progress :
+        the rules of the Cell sets first (see `propagate`), then the
+        inference rules of `self.rules` (see `RULES`), in order of cost.
+        As soon as one of them makes some progress, the cheaper rules are
+        applied again to fixpoint before trying the more expensive ones.
+        
+        units : set numbers to process first (default : all the Cell sets)
+        max_subset : see `process_set`
+        
+        Returns the number of Cell sets processed
+        """
+        nb_processed = self.propagate(units, max_subset)
+        changed = self._apply_inference_rules()
+        while changed:
+            nb_processed += self.propagate(changed, max_subset)
+            changed = self._apply_inference_rules()
+        return nb_processed
+    
+    def _apply_inference_rules(self):
+        """apply the inference rules of `self.rules` in order, up to the
+        first one making some progress. A rule is either the name of a
+        method (see `_rule_methods`) or a function called as `rule(self)`
+        and returning the number of possibilities eliminated.
+        
+        Returns the list of the Cell sets of the Cells changed
+        (empty if there was no progress)
+        """
+        for rule in self.rules:
+            if self.budget is not None:
+                self.budget.check()
+            if callable(rule):
+                (name, function) = (getattr(rule, '__name__', 'rule'),
+                                    lambda rule=rule: rule(self))
+            elif rule in self._rule_methods:
+                (name, function) = (rule,
+                                    getattr(self, self._rule_methods[rule]))
+            else:
+                raise ValueError('Unknown inference rule "%s"' % rule)
+            # the Cell sets of the Cells changed are collected
+            # like in `propagate`
+            queue = deque()
+            self._queue = (queue, [False]*len(self.units))
+            try:
+                if self.stats is not None:
+                    start = time.perf_counter()
+                    nb_eliminated = function()
+                    self.stats.record(name, 'grid',
+                                      time.perf_counter() - start,
+                                      int(nb_eliminated > 0), nb_eliminated)
+                else:
+                    function()
+            finally:
+                self._queue = None
+            if queue:
+                return list(queue)
+        return []
+    
+    def is_solved(self):
+        """is the whole grid solved, that is every Cell is solved"""
+        popcount = self._tables.popcount
+        return all(popcount[m] == 1 for m in self.masks)
+    
+    def check_units(self):
+        """check the consistency of each Cell set of the grid:
+        solved Cells must hold distinct numbers and each number
+        must still be possible somewhere in the set.
+        
+        Raises Contradiction if some set is inconsistent
+        """
+        masks = self.masks
+        (nb_numbers, full_mask, popcount, lowest_digit,
+         mask_digits, bit_indices) = self._tables
+        for n, unit in enumerate(self.units):
+            seen = 0
+            union = 0
+            for i in unit:
+                m = masks[i]
+                union |= m
+                if popcount[m] == 1:
+                    if seen & m:
+                        raise Contradiction('Number %d is solved twice '
+                                            'in Cell set %d' %
+                                            (lowest_digit[m], n))
+                    seen |= m
+            if union != full_mask:
+                raise Contradiction('Numbers %s cannot be placed in Cell '
+                                    'set %d' %
+                                    (set(mask_digits[full_mask & ~union]), n))
+    # end check_units
+    
+    def to_string(self):
+        """compact string of the grid : the 81 Cells (N*N for an NxN grid)
+        in row-major order, with "." for unsolved Cells
+        (see `_SYMBOLS` for the numbers above 9)"""
+        popcount = self._tables.popcount
+        lowest_digit = self._tables.lowest_digit
+        return ''.join(_SYMBOLS[lowest_digit[m]-1] if popcount[m] == 1 else '.'
+                       for m in self.masks)
+    
+    def search(self):
+        """solve the game by a depth-first search,
+        the Sudoku rules being applied after each guess
+        (see `propagate`).
+        
+        The search branches on the unsolved Cell with the fewest remaining
+        possibilities. When a solution is found, the grid is left in
+        the solved state, otherwise it is left unchanged.
+        
+        Returns (solution, stats) with
+         * solution : 81 characters string of the solved grid
+                      (see `to_string`), or None if there is no solution
+         * stats : dict of search statistics :
+           - 'nodes' : number of explored nodes (guesses + root)
+           - 'backtracks' : number of dead ends met
+           - 'max_depth' : maximum number of nested guesses
+        
+        Raises BudgetExceeded if the `budget` of the game is exhausted,
+        the grid being left unchanged.
+        """
+        stats = {'nodes': 0, 'backtracks': 0, 'max_depth': 0}
+        self.search_stats = stats
+        root = self.checkpoint()
+        try:
+            # the search generator is left suspended in the solved state
+            solution = next(self._search(0, stats), None)
+        except BudgetExceeded:
+            self.undo(root)
+            raise
+        if solution is None:
+            self.undo(root)
+        else:
+            self.commit(root)
+        return (solution, stats)
+    # end search
+    
+    def count_solutions(self, limit=2, backend='rules', workers=None):
+        """count the solutions of the game, stopping the search as soon as
+        `limit` solutions are found (no limit if `limit` is None).
+        
+        backend : 'rules' for the depth-first search of `search`,
+                  'dlx' for the exact cover solver (see `sudoku_dlx` module)
+        workers : [optional] number of worker processes sharing the
+                  search of the 'rules' backend (see `sudoku_parallel`)
+        
+        The grid is left unchanged and the search statistics are available
+        in `search_stats`.
+        
+        Returns the number of solutions found : 0, 1, ... up to `limit`
+        
+        Raises BudgetExceeded if the `budget` of the game is exhausted,
+        the grid being left unchanged.
+        """
+        if backend == 'rules' and workers is not None and workers > 1:
+            from sudoku_parallel import count_solutions_parallel
+            return count_solutions_parallel(self, limit, workers)
+        stats = {'nodes': 0, 'backtracks': 0, 'max_depth': 0}
+        self.search_stats = stats
+        if backend == 'dlx':
+            from sudoku_dlx import sudoku_matrix
+            solutions = sudoku_matrix(self).solutions(stats, self.budget)
+        elif backend == 'rules':
+            solutions = self._search(0, stats)
+        else:
+            raise ValueError('Unknown solver backend "%s"' % backend)
+        root = self.checkpoint()
+        nb_solutions = 0
+        try:
+            if limit is None or limit > 0:
+                for solution in solutions:
+                    nb_solutions += 1
+                    if nb_solutions == limit:
+                        break
+        finally:
+            self.undo(root)
+        return nb_solutions
+    # end count_solutions
+    
+    def is_unique(self, backend='rules', workers=None):
+        """has the game exactly one solution ?
+        (see `count_solutions`)"""
+        return self.count_solutions(limit=2, backend=backend,
+                                    workers=workers) == 1
+    
+    def _search(self, depth, stats, guess=None):
+        """recursive depth-first search generator,
+        yields the solutions found below the current grid state
+        (which is left modified).
+        `guess` is the index of the Cell which was just guessed
+        (None at the root of the search)"""
+        stats['nodes'] += 1
+        stats['max_depth'] = max(stats['max_depth'], depth)
+        if self.budget is not None:
+            self.budget.add_node()
+        # 1) Propagate the consequences of the current state:
+        try:
+            if guess is None:
+                self.apply_rules()
+            else:
+                self.apply_rules(self.cell_units[guess])
+            self.check_units()
+        except Contradiction:
+            stats['backtracks'] += 1
+            return
+        # 2) Choose the most constrained unsolved Cell:
+        best = self._choose_cell()
+        if best is None:
+            # all Cells are solved
+            yield self.to_string()
+            return
+        # 3) Try each possibility in turn, rolling back only the Cells
+        #    changed by each guess:
+        for k in self._tables.bit_indices[self.masks[best]]:
+            checkpoint = self.checkpoint()
+            self._set_mask(best, 1 << k)
+            for solution in self._search(depth+1, stats, best):
+                yield solution
+            self.undo(checkpoint)
+    # end _search
+    
+    def _choose_cell(self):
+        """index of the unsolved Cell with the fewest possibilities,
+        where the searches branch (None if all the Cells are solved)"""
+        popcount = self._tables.popcount
+        best = None
+        best_count = self._tables.nb_numbers + 1
+        for i, m in enumerate(self.masks):
+            count = popcount[m]
+            if 1 < count < best_count:
+                best, best_count = i, count
+                if count == 2:
+                    break
+        return best
+    
+    def propagate(self, units=None, max_subset=_MAX_SUBSET):
+        """apply the Sudoku rules (see `process_set`) until there is no more
+        progress, in an event-driven way : a Cell set is processed again
+        only when one of its Cells got some progress in the meantime.
+        
+        units : set numbers to process first (default : all the Cell sets)
+        max_subset : largest subsets looked for by the rules
+                     (see `process_set`)
+        
+        Returns the number of Cell sets processed
+        """
+        if units is None:
+            units = range(len(self.units))
+        queued = [False]*len(self.units)
+        queue = deque()
+        for n in units:
+            if not queued[n]:
+                queued[n] = True
+                queue.append(n)
+        self._queue = (queue, queued)
+        nb_processed = 0
+        budget = self.budget
+        try:
+            while queue:
+                if budget is not None:
+                    budget.check()
+                n = queue.popleft()
+                queued[n] = False
+                self.process_set(n, max_subset)
+                nb_processed += 1
+        finally:
+            self._queue = None
+        return nb_processed
+    # end propagate
+    
+    def _cell_changed(self, i, old_mask):
+        """notification of a change of the possibilities of Cell `i`
+        (previously `old_mask`) : the change is recorded in the undo log
+        and its Cell sets are queued again while propagating"""
+        if self._trail is not None:
+            self._trail.append((i, old_mask))
+        if self.stats is not None:
+            self.stats.cell_changes += 1
+        if self._queue is not None:
+            (queue, queued) = self._queue
+            for n in self.cell_units[i]:
+                if not queued[n]:
+                    queued[n] = True
+                    queue.append(n)
+    
+    def solve_game(self, max_iter=20, search=False, backend='rules',
+                   incremental=False, stats=None, cache=None, budget=None,
+                   rules=None, workers=None):
         '''(attempt to) solve the Sudoku game
         
-        It works by calling iteratively the `process_all_sets` method
-        until there is no more progress OR until `max_iter` is reached
+        With the default backend `'rules'`, it works by calling iteratively
+        the `process_all_sets` method until there is no more progress
+        OR until `max_iter` is reached.
+        When the rules of the Cell sets make no more progress, the inference
+        rules working across them are tried (see `rules` below).
+        If `incremental` is True, the rules are rather applied in an
+        event-driven way until there is no more progress (see `apply_rules`)
+        and `nb_iter` is then the number of Cell sets processed.
+        If `search` is True and the grid is still unsolved after that,
+        the game is finished with a depth-first search (see `search`)
+        whose statistics are then available in `search_stats`.
+        A contradictory grid then gives is_solved False, whereas without
+        `search` the rules raise Contradiction.
+        
+        With the backend `'dlx'`, the game is solved as an exact cover problem
+        with dancing links (see `sudoku_dlx` module) and `nb_iter` is 0.
+        The search statistics are available in `search_stats` as well.
+        
+        stats : [optional] SolverStats instance (or True to create one)
+                collecting timing information about the rules during this
+                call. It is then available as `self.last_stats`
+                (see `SolverStats.report`)
+        cache : [optional] `sudoku_cache.SolutionCache` instance, consulted
+                before solving (`nb_iter` is then 0) and updated with the
+                solutions found
+        budget : [optional] SolveBudget instance limiting the solving time
+                 and the number of search nodes. When it is exhausted, the
+                 solving stops with is_solved False, the grid holding the
+                 progress made by the rules, and the reason is available
+                 as `budget.reason`. The budget only applies to this call
+        rules : [optional] inference rules to use, in order of cost
+                (see `RULES`, `()` for none). They are kept in `self.rules`
+                for the following searches (see `apply_rules`). They are
+                checked before solving : an unknown rule name raises
+                ValueError, and a rule which is neither a name nor a
+                function raises TypeError
+        workers : [optional] number of worker processes sharing the search
+                  of a single hard grid (see `sudoku_parallel`), None or 1
+                  for searching in the current process
         
         Returns (is_solved, nb_iter) with
          * is_solved : boolean flag for success
          * nb_iter : (int) number of iterations used to solve the game
         '''
-        # TODO : add timing information
-        for nb_iter in range(1, max_iter+1):
-            progress = self.process_all_sets()
-            if not progress:
-                # Stop working if there is no more progress
-                nb_iter -= 1
-                print('No more progress after %d iterations' % nb_iter)
-                break
-        else:
-            print('Maximum number of iteration (%d) reached !' % max_iter)
-        # Check if we solved the game
-        is_solved = all(c.is_solved() for c in self.cells)
+        if rules is not None:
+            rules = self._check_rules(rules)
+        if stats is True:
+            stats = SolverStats()
+        # the statistics and the budget only apply to this call
+        (previous_stats, self.stats) = (self.stats, stats)
+        (previous_budget, self.budget) = (self.budget, budget)
+        self.last_stats = stats
+        try:
+            return self._solve_game(max_iter, search, backend, incremental,
+                                    stats, cache, budget, rules, workers)
+        finally:
+            self.stats = previous_stats
+            self.budget = previous_budget
+    
+    def _check_rules(self, rules):
+        """tuple of the inference rules `rules` : a rule name or a
+        collection of rule names (see `_rule_methods`) and functions
+        (see `_apply_inference_rules`)
+        
+        Raises TypeError for a rule which is neither a name nor a function,
+        ValueError for an unknown rule name
+        """
+        if isinstance(rules, str):
+            rules = (rules,)
+        rules = tuple(rules)
+        for rule in rules:
+            if callable(rule):
+                continue
+            if not isinstance(rule, str):
+                raise TypeError('Inference rule %r is neither a rule name '
+                                'nor a function' % (rule,))
+            if rule not in self._rule_methods:
+                raise ValueError('Unknown inference rule "%s" (should be '
+                                 'one of %s)' % (rule, ', '.join(RULES)))
+        return rules
+    
+    def _solve_game(self, max_iter, search, backend, incremental, stats,
+                    cache, budget, rules, workers):
+        """body of `solve_game`, the `stats` and `budget` being set in
+        `self.stats` and `self.budget`"""
+        if backend not in ('rules', 'dlx'):
+            raise ValueError('Unknown solver backend "%s"' % backend)
+        if rules is not None:
+            self.rules = tuple(rules)
+        if stats is not None:
+            start = time.perf_counter()
+        if cache is not None:
+            puzzle = self.to_string()
+            if self._use_solution(cache.get(puzzle)):
+                self._report('Solution found in the cache')
+                if stats is not None:
+                    stats.total_time += time.perf_counter() - start
+                return (True, 0)
+        nb_iter = 0
+        try:
+            if backend == 'dlx':
+                from sudoku_dlx import solve_dlx
+                (solution, self.search_stats) = solve_dlx(self, budget)
+                self._report('Exact cover search : %(nodes)d nodes, '
+                             '%(backtracks)d backtracks, '
+                             'max depth %(max_depth)d',
+                             self.search_stats)
+            elif incremental:
+                nb_iter = self.apply_rules()
+                self._report('No more progress after processing %d Cell sets',
+                             nb_iter)
+                if stats is not None:
+                    stats.end_iteration(self)
+            else:
+                for nb_iter in range(1, max_iter+1):
+                    progress = self.process_all_sets()
+                    if not progress:
+                        # the Cell sets are stuck : try the rules
+                        # working across them
+                        progress = bool(self._apply_inference_rules())
+                    if stats is not None:
+                        stats.end_iteration(self)
+                    if not progress:
+                        # Stop working if there is no more progress
+                        nb_iter -= 1
+                        self._report('No more progress after %d iterations',
+                                     nb_iter)
+                        break
+                else:
+                    self._report('Maximum number of iteration (%d) reached !',
+                                 max_iter)
+            # Check if we solved the game
+            is_solved = self.is_solved()
+            if not is_solved and search and backend == 'rules':
+                if workers is not None and workers > 1:
+                    from sudoku_parallel import search_parallel
+                    (solution, search_stats) = search_parallel(self, workers)
+                else:
+                    (solution, search_stats) = self.search()
+                is_solved = solution is not None
+                self._report('Depth-first search : %(nodes)d nodes, '
+                             '%(backtracks)d backtracks, '
+                             'max depth %(max_depth)d',
+                             search_stats)
+        except BudgetExceeded:
+            # the grid keeps the progress of the rules,
+            # the search (if any) being rolled back
+            is_solved = False
+            self._report('Solving interrupted (%s) with %d solved cells',
+                         budget.reason, self.nb_solved())
+        except Contradiction as e:
+            # contradictory grid : a dead end for the search,
+            # like for the exact cover backend
+            if not search:
+                raise
+            is_solved = False
+            self._report('Contradictory grid : %s', str(e))
+        if stats is not None:
+            stats.total_time += time.perf_counter() - start
+            stats.search = self.search_stats
         if is_solved:
-            print('Sudoku successfully solved !')
+            if cache is not None:
+                cache.put(puzzle, self.to_string())
+            self._report('Sudoku successfully solved !')
         else:
-            print('Unable to solve the Sudoku :-(')
+            self._report('Unable to solve the Sudoku :-(')
         # Report back:
         return (is_solved, nb_iter)
     
+    def _use_solution(self, solution):
+        '''set the grid to the compact `solution` string (or None),
+        if it is compatible with the current possibilities.
+        Returns True if the grid was set'''
+        if solution is None:
+            return False
+        masks = [1 << _SYMBOLS.index(ch) for ch in solution]
+        if any(not (m & current) for m, current in zip(masks, self.masks)):
+            return False
+        for i, m in enumerate(masks):
+            self._set_mask(i, m)
+        return True
+    
+    def canonical_form(self):
+        '''canonical form of the grid at current state, up to the
+        symmetries of the game (see `sudoku_cache.canonical_form`)
+        
+        Returns (canonical, transform) : the canonical compact string and
+        the symmetry mapping `self.to_string()` to it
+        '''
+        from sudoku_cache import canonical_form
+        return canonical_form(self.to_string())
+    
+    def _stacks(self, items, separator):
+        """join the list of the `items` of a row, block by block :
+        items within a block are joined with `separator`,
+        blocks with `separator` around a vertical bar (or 2 spaces
+        if `separator` is empty)"""
+        B1 = self.block_size[1]
+        bar = separator + '|' + separator if separator else '  '
+        return bar.join(separator.join(items[k:k+B1])
+                        for k in range(0, len(items), B1))
+    
     def __str__(self):
-        """visual text representation of the Sudoku grid at current state
-        Note : this function assumes block_size == (3,3) 
-        and grid width being 9 (that is the usual Sudoku format)
-        """
+        """visual text representation of the Sudoku grid at current state"""
         (N0, N1) = self.grid_size
+        B0 = self.block_size[0]
         s = ""
         for a0 in range(N0):
-            if a0 % 3 == 0 and a0 != 0:
+            if a0 % B0 == 0 and a0 != 0:
                 s+= '\n'
             str_list = [str(c) for c in self.get_row_set(a0)]
-            s += ''.join(str_list[0:3]) + '  ' +\
-                 ''.join(str_list[3:6]) + '  ' +\
-                 ''.join(str_list[6:9]) + '\n'
+            s += self._stacks(str_list, '') + '\n'
         s += '\n'
         # end for
         return s
     # end __str__
     
+    # Display methods (see `sudoku_display`, imported on first use)
+    
     def print_grid(self):
         """displays the Sudoky grid, in a fancier way than print()"""
-        (N0, N1) = self.grid_size
-        s = "Sudoku grid '%s':\n\n" % os.path.basename(self.sudoku_file)
-        for a0 in range(N0):
-            if a0 % 3 == 0 and a0 != 0:
-                    s+= '------+-------+------\n'
-            str_list = [str(c) for c in self.get_row_set(a0)]
-            s += ' '.join(str_list[0:3]) + ' | ' +\
-                 ' '.join(str_list[3:6]) + ' | ' +\
-                 ' '.join(str_list[6:9]) + '\n'
-        s+= '\n\nNumber of solved cells : %d/81' % \
-            len([c for c in self.cells if c.is_solved()])
-        
-        print(s)
-    #end print_grid
+        from sudoku_display import print_grid
+        print_grid(self)
     
     def print_all_possibilities(self):
         """displays the Sudoky grid,
         with all the available possibilities in each cell
+        (colored if the `termcolor` module is installed)
         """
-        (N0, N1) = self.grid_size
-        # Display colors, depending on the number of remaining possibilities:
-        colors = {1:'green',2:'cyan'}
-        print("Sudoku grid '%s':\n" % os.path.basename(self.sudoku_file))
-        for a0 in range(N0):
-            if a0 % 3 == 0 and a0 != 0:
-                print('------------+-------------+------------')
-            # Get all possibilities for each cell in the current row:
-            str_list = [ ''.join(str(p) for p in c.possibilities)
-                         for c in self.get_row_set(a0)]
-            # prepare the color to use for each cell:
-            color_list = [colors.get(len(s)) for s in str_list]
-            # pad all the possibilities strings to fixed with 9
-            str_list = [s.center(9) for s in str_list]
-            # Split the possibilities into three lines:
-            for i in range(3):
-                # Select 3 possibilities for each Cell:
-                str_list_i = [s[3*i:3*i+3] for s in str_list]
-                # Add the color control characters:
-                str_list_i = [colored(s,color)
-                              for s,color in zip(str_list_i, color_list)]
-                print(' '.join(str_list_i[0:3]) + ' | ' +\
-                      ' '.join(str_list_i[3:6]) + ' | ' +\
-                      ' '.join(str_list_i[6:9]))
-        print('\nNumber of solved cells : %d/81' % 
-              len([c for c in self.cells if c.is_solved()]))
-    # end pring_all_possibilities
+        from sudoku_display import print_all_possibilities
+        print_all_possibilities(self)
     
     def print_nb_possibilities(self):
         """displays the number of remaining possibilities in each cell
         a `'` means the cell is solved (that is only one remaining possibility)
+        (numbers above 9 are written like in the grid, see `_SYMBOLS`)
         """
-        (N0, N1) = self.grid_size          
-        print("Number of remaining possibilities :\n")
-        for a0 in range(N0):
-            if a0 > 0 and a0 % 3 == 0:
-                print('')
-            str_list = [str(len(c.possibilities)) for c in self.get_row_set(a0)]
-            str_list = ['\'' if char=='1' else char for char in str_list]
-            s  = ''.join(str_list[0:3]) + '  ' +\
-                 ''.join(str_list[3:6]) + '  ' +\
-                 ''.join(str_list[6:9]) + '  '
-            print(s)
-        print('\nNumber of solved cells : %d/81' % 
-              len([c for c in self.cells if c.is_solved()]))
+        from sudoku_display import print_nb_possibilities
+        print_nb_possibilities(self)
 
 if __name__ == '__main__':
     print("Sudoku solver program")